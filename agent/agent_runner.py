@@ -1,8 +1,9 @@
-from agent.prompt_template import build_prompt
+from agent.prompt_template import build_prompt, compute_schema_fingerprint
+from agent.question_cache import get_question_cache
 from services.llm_service import generate_cypher
-from services.neo4j_service import run_cypher
+from services.neo4j_service import run_cypher_stream, apply_row_limit
 from services.output_formatter import format_response
-from config.settings import VERBOSE
+from config.settings import VERBOSE, QUERY_PREVIEW_ROWS, QUERY_PREVIEW_LIMIT_REWRITE
 
 
 def log_verbose(message: str) -> None:
@@ -15,19 +16,31 @@ def answer_question(question: str) -> str:
     log_verbose("Starting question processing")
     log_verbose(f"Input question: {question}")
     
-    # build prompt with schema and examples
-    prompt = build_prompt(question)
-    log_verbose("Built prompt with schema and examples")
-    if VERBOSE:
-        print("[DEBUG] Full prompt:")
-        print("─" * 50)
-        print(prompt)
-        print("─" * 50)
+    # reuse cypher from a near-duplicate question if the schema has not changed, checked with
+    # the cheap fingerprint so a cache hit never builds the schema snapshot
+    question_cache = get_question_cache()
+    cypher = None
+    if question_cache:
+        question_cache.validate_schema(compute_schema_fingerprint())
+        cypher = question_cache.lookup(question)
+        if cypher:
+            log_verbose(f"Question cache hit: {cypher}")
+    from_cache = cypher is not None
     
-    # generate cypher query
-    log_verbose("Generating Cypher query...")
-    cypher = generate_cypher(prompt)
-    log_verbose(f"Generated Cypher: {cypher}")
+    if not from_cache:
+        # build prompt with schema and examples
+        prompt = build_prompt(question)
+        log_verbose("Built prompt with schema and examples")
+        if VERBOSE:
+            print("[DEBUG] Full prompt:")
+            print("─" * 50)
+            print(prompt)
+            print("─" * 50)
+        
+        # generate cypher query
+        log_verbose("Generating Cypher query...")
+        cypher = generate_cypher(prompt)
+        log_verbose(f"Generated Cypher: {cypher}")
     
     # check if it's an error message or explanation (not a query)
     cypher_upper = cypher.upper().strip()
@@ -35,10 +48,17 @@ def answer_question(question: str) -> str:
         log_verbose("Error message or explanation detected, skipping database execution")
         return f"question: {question}\n\n🛡️  {cypher}"
     
-    # execute query against database
+    # execute query against database, only pulling the rows we will display
+    # (plus one to know whether there are more)
     log_verbose("Executing query against Neo4j...")
-    results = run_cypher(cypher)
-    log_verbose(f"Query returned {len(results)} results")
+    preview_rows = QUERY_PREVIEW_ROWS + 1
+    executed = apply_row_limit(cypher, preview_rows) if QUERY_PREVIEW_LIMIT_REWRITE else cypher
+    if executed != cypher:
+        log_verbose(f"Executing with preview limit: {executed}")
+    results = list(run_cypher_stream(executed, max_rows=preview_rows))
+    truncated = len(results) > QUERY_PREVIEW_ROWS
+    results = results[:QUERY_PREVIEW_ROWS]
+    log_verbose(f"Query returned {len(results)}{'+' if truncated else ''} results")
     if VERBOSE and results:
         print("[DEBUG] Raw results:")
         for i, result in enumerate(results[:3]):  # show first 3 results
@@ -46,9 +66,14 @@ def answer_question(question: str) -> str:
         if len(results) > 3:
             print(f"  ... and {len(results) - 3} more")
     
+    # only remember queries that actually ran
+    failed = results and results[0].get('status') == 'database_error'
+    if question_cache and not from_cache and not failed:
+        question_cache.store(question, cypher)
+    
     # format response for display
     log_verbose("Formatting response for display")
-    formatted_response = format_response(question, cypher, results)
+    formatted_response = format_response(question, cypher, results, truncated)
     log_verbose("Question processing complete")
     
     return formatted_response 
\ No newline at end of file
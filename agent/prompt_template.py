@@ -1,16 +1,167 @@
+import json
 import os
-from agent.schema_discovery import generate_schema_description, generate_dynamic_examples
+import threading
+import time
+from agent.schema_discovery import generate_schema_description, generate_dynamic_examples, clear_discovery_cache
+from services.neo4j_service import run_cypher_real, USE_MOCK_NEO4J
+from config.settings import SCHEMA_SNAPSHOT_CHECK_INTERVAL, SCHEMA_SNAPSHOT_PATH, NYPD_VICTIM_MODEL, NYPD_SUSPECT_MODEL
+
+NYPD_SCHEMA_FILE = "data/nypd/schema_description.txt"
+
+# every count here is answered from the count store, no nodes are scanned
+GRAPH_FINGERPRINT_QUERY = """
+CALL { MATCH (n) RETURN count(n) AS nodes }
+CALL { MATCH ()-[r]->() RETURN count(r) AS relationships }
+CALL { CALL db.labels() YIELD label RETURN collect(label) AS labels }
+CALL { CALL db.relationshipTypes() YIELD relationshipType RETURN collect(relationshipType) AS types }
+RETURN nodes, relationships, labels, types
+"""
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+# what the static schema description needs to say when the loader did not build one node per person
+PERSON_MODEL_NOTES = {
+    ('Victim', 'profile'): "- Victim nodes are shared demographic profiles, one per (vicAgeGroup, vicRace, vicSex) combination; they have no vicId and many incidents point at the same Victim",
+    ('Suspect', 'profile'): "- Suspect nodes are shared demographic profiles, one per (suspAgeGroup, suspRace, suspSex) combination; they have no suspId and many incidents point at the same Suspect",
+    ('Victim', 'property'): "- there are no Victim nodes or INVOLVES_VICTIM relationships; victim demographics are Incident properties vicAgeGroup, vicRace and vicSex",
+    ('Suspect', 'property'): "- there are no Suspect nodes or INVOLVES_SUSPECT relationships; suspect demographics are Incident properties suspAgeGroup, suspRace and suspSex",
+}
 
 
 def get_nypd_schema_description():
     """load the static nypd schema description if it exists"""
-    schema_file = "data/nypd/schema_description.txt"
+    schema_file = NYPD_SCHEMA_FILE
     if os.path.exists(schema_file):
         with open(schema_file, 'r') as f:
-            return f.read()
+            description = f.read()
+        notes = [
+            PERSON_MODEL_NOTES[(label, model)]
+            for label, model in (('Victim', NYPD_VICTIM_MODEL), ('Suspect', NYPD_SUSPECT_MODEL))
+            if (label, model) in PERSON_MODEL_NOTES
+        ]
+        if notes:
+            description = description.rstrip() + "\n\nMODELLING NOTES:\n" + "\n".join(notes) + "\n"
+        return description
     return None
 
 
+def compute_schema_fingerprint() -> str:
+    """cheap change detector for whatever the schema description is built from"""
+    if os.path.exists(NYPD_SCHEMA_FILE):
+        stat = os.stat(NYPD_SCHEMA_FILE)
+        return f"file:{stat.st_mtime_ns}:{stat.st_size}"
+    
+    # the mock database never changes
+    if USE_MOCK_NEO4J:
+        return "mock"
+    
+    result = run_cypher_real(GRAPH_FINGERPRINT_QUERY)
+    if not result or result[0].get('status') == 'database_error':
+        return f"unavailable:{result[0].get('message') if result else ''}"
+    record = result[0]
+    return f"graph:{record['nodes']}:{record['relationships']}:{sorted(record['labels'])}:{sorted(record['types'])}"
+
+
+def snapshot_key(fingerprint: str) -> str:
+    """the fingerprint plus the settings the description depends on"""
+    return f"{fingerprint}|{NYPD_VICTIM_MODEL}|{NYPD_SUSPECT_MODEL}"
+
+
+def load_saved_snapshot(key: str):
+    """the snapshot saved by an earlier process, or None when missing or built for another schema"""
+    if not SCHEMA_SNAPSHOT_PATH or not os.path.exists(SCHEMA_SNAPSHOT_PATH):
+        return None
+    try:
+        with open(SCHEMA_SNAPSHOT_PATH, 'r') as f:
+            saved = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if saved.get('key') != key:
+        return None
+    return saved
+
+
+def save_snapshot(key: str, description: str, examples) -> None:
+    if not SCHEMA_SNAPSHOT_PATH:
+        return
+    directory = os.path.dirname(SCHEMA_SNAPSHOT_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = SCHEMA_SNAPSHOT_PATH + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'key': key, 'description': description, 'examples': examples}, f)
+    os.replace(temp_path, SCHEMA_SNAPSHOT_PATH)
+
+
+def get_schema_snapshot() -> dict:
+    """schema description and examples, rebuilt only when the fingerprint changes
+
+    the fingerprint itself is re-checked at most every SCHEMA_SNAPSHOT_CHECK_INTERVAL seconds.
+    the snapshot is also saved to SCHEMA_SNAPSHOT_PATH, so a new process (one cli question)
+    reuses it after a single fingerprint query instead of running discovery again
+    """
+    global _snapshot
+    with _snapshot_lock:
+        now = time.monotonic()
+        if _snapshot and now - _snapshot['checked_at'] < SCHEMA_SNAPSHOT_CHECK_INTERVAL:
+            return _snapshot
+        
+        fingerprint = compute_schema_fingerprint()
+        if _snapshot and _snapshot['fingerprint'] == fingerprint:
+            _snapshot['checked_at'] = now
+            return _snapshot
+        
+        key = snapshot_key(fingerprint)
+        saved = load_saved_snapshot(key)
+        if saved:
+            _snapshot = {
+                'description': saved['description'],
+                'examples': saved['examples'],
+                'fingerprint': fingerprint,
+                'checked_at': now
+            }
+            return _snapshot
+        
+        # the graph changed, so the memoized discovery pass is stale too
+        clear_discovery_cache()
+        
+        # try to get nypd specific schema first, fallback to dynamic discovery
+        nypd_schema = get_nypd_schema_description()
+        if nypd_schema:
+            schema_description = nypd_schema
+            examples = get_nypd_examples()
+        else:
+            schema_description = generate_schema_description()
+            examples = generate_dynamic_examples()[:10]
+        
+        # an unreachable database gives a placeholder description, not worth keeping across runs
+        if not fingerprint.startswith('unavailable:'):
+            try:
+                save_snapshot(key, schema_description, examples)
+            except OSError:
+                pass
+        
+        _snapshot = {
+            'description': schema_description,
+            'examples': examples,
+            'fingerprint': fingerprint,
+            'checked_at': now
+        }
+        return _snapshot
+
+
+def invalidate_schema_snapshot() -> None:
+    """forces the next prompt to rebuild the schema snapshot (e.g. after a build)"""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+        if SCHEMA_SNAPSHOT_PATH and os.path.exists(SCHEMA_SNAPSHOT_PATH):
+            os.remove(SCHEMA_SNAPSHOT_PATH)
+    clear_discovery_cache()
+
+
 def get_nypd_examples():
     """specific examples for nypd crime data"""
     return [
@@ -26,22 +177,27 @@ def get_nypd_examples():
             'question': 'What are the most common offense types?',
             'cypher': 'MATCH (i:Incident)-[:CLASSIFIED_AS]->(o:Offense) RETURN o.offenseDescription, count(i) as incident_count ORDER BY incident_count DESC LIMIT 10'
         },
-        {
-            'question': 'Find all felony cases with victims in their 20s',
-            'cypher': 'MATCH (i:Incident {lawCategory: "FELONY"})-[:INVOLVES_VICTIM]->(v:Victim) WHERE v.vicAgeGroup = "18-24" OR v.vicAgeGroup = "25-44" RETURN i, v LIMIT 10'
-        }
+        get_victim_age_example()
     ]
 
 
-def build_prompt(question: str) -> str:
-    # try to get nypd specific schema first, fallback to dynamic discovery
-    nypd_schema = get_nypd_schema_description()
-    if nypd_schema:
-        schema_description = nypd_schema
-        examples = get_nypd_examples()
+def get_victim_age_example():
+    """the victim demographics example, written for how victims are modelled"""
+    question = 'Find all felony cases with victims in their 20s'
+    if NYPD_VICTIM_MODEL == 'property':
+        cypher = 'MATCH (i:Incident) WHERE i.lawCategory = "FELONY" AND i.vicAgeGroup IN ["18-24", "25-44"] RETURN i LIMIT 10'
+    elif NYPD_VICTIM_MODEL == 'profile':
+        # start from the handful of matching profiles and expand to their incidents
+        cypher = 'MATCH (v:Victim) WHERE v.vicAgeGroup IN ["18-24", "25-44"] MATCH (i:Incident)-[:INVOLVES_VICTIM]->(v) WHERE i.lawCategory = "FELONY" RETURN i, v LIMIT 10'
     else:
-        schema_description = generate_schema_description()
-        examples = generate_dynamic_examples()[:10]
+        cypher = 'MATCH (i:Incident)-[:INVOLVES_VICTIM]->(v:Victim) WHERE i.lawCategory = "FELONY" AND v.vicAgeGroup IN ["18-24", "25-44"] RETURN i, v LIMIT 10'
+    return {'question': question, 'cypher': cypher}
+
+
+def build_prompt(question: str) -> str:
+    snapshot = get_schema_snapshot()
+    schema_description = snapshot['description']
+    examples = snapshot['examples']
     
     # build examples section
     examples_text = ""
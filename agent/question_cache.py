@@ -0,0 +1,314 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from config.settings import (
+    QUESTION_CACHE_ENABLED, QUESTION_CACHE_PATH,
+    QUESTION_CACHE_MAX_ENTRIES, QUESTION_CACHE_THRESHOLD
+)
+
+STOPWORDS = {
+    'a', 'an', 'the', 'in', 'on', 'at', 'of', 'for', 'to', 'from', 'by', 'with', 'and', 'or',
+    'is', 'are', 'was', 'were', 'be', 'been', 'do', 'does', 'did', 'there', 'that', 'which',
+    'what', 'me', 'my', 'i', 'we', 'you', 'please', 'can', 'could', 'would', 'give', 'tell',
+    'get', 'all', 'any', 'some', 'this', 'these', 'those', 'it', 'its', 'occurred', 'happened'
+}
+
+# negation and comparison words flip or narrow a question's meaning while barely moving its
+# similarity score, so a cached entry is only served when these match exactly (numbers too)
+GUARD_WORDS = {
+    'not', 'no', 'none', 'never', 'without', 'except', 'excluding', 'outside',
+    'more', 'less', 'fewer', 'greater', 'over', 'under', 'above', 'below',
+    'before', 'after', 'since', 'until', 'between', 'least', 'most', 'than'
+}
+
+# phrases that mean the same thing collapse to one token before vectorizing
+SYNONYMS = [
+    (r"n't\b", ' not'),
+    (r'\bhow many\b|\bnumber of\b|\btotal\b', 'count'),
+    (r'\b(?:list|display|find|return|what are)\b', 'show'),
+    (r'\b(?:crimes?|complaints?|cases?|reports?)\b', 'incidents'),
+    (r'\bincident\b', 'incidents'),
+]
+
+# literals that are pulled out as slots so "brooklyn" and "queens" share one cache entry
+SLOT_VALUES = {
+    'borough': ['staten island', 'manhattan', 'brooklyn', 'queens', 'bronx'],
+    'law_category': ['felony', 'misdemeanor', 'violation'],
+    'offense': [
+        'grand larceny of motor vehicle', 'grand larceny', 'petit larceny', 'felony assault',
+        'assault', 'robbery', 'burglary', 'harassment', 'criminal mischief', 'dangerous drugs',
+        'dangerous weapons', 'sex crimes', 'rape', 'murder', 'fraud', 'theft', 'arson',
+        'forgery', 'kidnapping'
+    ],
+}
+
+TOKEN_PATTERN = re.compile(r'<\w+>|[a-z0-9]+')
+
+
+def build_slot_pattern():
+    """one alternation over all slot literals, longest first so 'felony assault' beats 'felony'"""
+    literals = [(value, kind) for kind, values in SLOT_VALUES.items() for value in values]
+    literals.sort(key=lambda item: len(item[0]), reverse=True)
+    lookup = {value: kind for value, kind in literals}
+    alternation = '|'.join(re.escape(value) for value, _ in literals)
+    return re.compile(r'\b(' + alternation + r')\b'), lookup
+
+
+SLOT_PATTERN, SLOT_KINDS = build_slot_pattern()
+
+
+def normalize_question(question: str):
+    """returns (normalized text, [(slot kind, value), ...]) for a question"""
+    text = ' '.join(question.lower().split())
+    slots = []
+
+    def take_slot(match):
+        value = match.group(1)
+        kind = SLOT_KINDS[value]
+        slots.append((kind, value))
+        return f' <{kind}> '
+
+    # slots come first so a synonym rule cannot split a literal like 'sex crimes'
+    text = SLOT_PATTERN.sub(take_slot, text)
+    for pattern, replacement in SYNONYMS:
+        text = re.sub(pattern, replacement, text)
+
+    tokens = [token for token in TOKEN_PATTERN.findall(text) if token not in STOPWORDS]
+    return ' '.join(tokens), slots
+
+
+def guard_tokens(normalized: str) -> list:
+    """the negation, comparison and number tokens of a normalized question, which must match exactly"""
+    return sorted(token for token in normalized.split() if token in GUARD_WORDS or any(c.isdigit() for c in token))
+
+
+def vectorize(normalized: str) -> Counter:
+    """character trigram and whole-word features, independent of word order"""
+    features = Counter()
+    for token in normalized.split():
+        features['w:' + token] += 1
+        padded = f' {token} '
+        for i in range(len(padded) - 2):
+            features[padded[i:i + 3]] += 1
+    return features
+
+
+def case_style(text: str) -> str:
+    """upper / title / lower / mixed"""
+    if text.isupper():
+        return 'upper'
+    if text.istitle():
+        return 'title'
+    if text.islower():
+        return 'lower'
+    return 'mixed'
+
+
+def match_case(style: str, value: str) -> str:
+    """renders value in the case style of the literal it replaces"""
+    if style == 'upper':
+        return value.upper()
+    if style == 'title':
+        return value.title()
+    return value
+
+
+class QuestionCache:
+    """near-duplicate question to cypher cache using tf-idf over character n-grams
+
+    entries are kept in lru order, bounded by max_entries and persisted as json
+    """
+
+    def __init__(self, path: str = None, max_entries: int = 500, threshold: float = 0.85):
+        self.path = path
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.schema_fingerprint = None
+        self.entries = OrderedDict()
+        self.document_frequency = Counter()
+        self.postings = {}
+        self.norms = {}
+        self.lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def add_entry(self, key, entry: dict) -> None:
+        entry['vector'] = vectorize(entry['normalized'])
+        entry['guards'] = guard_tokens(entry['normalized'])
+        self.entries[key] = entry
+        for feature in entry['vector']:
+            self.document_frequency[feature] += 1
+            self.postings.setdefault(feature, set()).add(key)
+        self.norms.clear()
+
+    def remove_entry(self, key) -> None:
+        entry = self.entries.pop(key)
+        for feature in entry['vector']:
+            self.document_frequency[feature] -= 1
+            if self.document_frequency[feature] <= 0:
+                del self.document_frequency[feature]
+            keys = self.postings.get(feature)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[feature]
+        self.norms.clear()
+
+    def idf(self, feature: str) -> float:
+        return math.log((1 + len(self.entries)) / (1 + self.document_frequency.get(feature, 0))) + 1
+
+    def norm(self, key) -> float:
+        if key not in self.norms:
+            vector = self.entries[key]['vector']
+            self.norms[key] = math.sqrt(sum((count * self.idf(f)) ** 2 for f, count in vector.items()))
+        return self.norms[key]
+
+    def lookup(self, question: str):
+        """returns cached cypher for a near-duplicate question, or None"""
+        normalized, slots = normalize_question(question)
+        kinds = [kind for kind, _ in slots]
+        values = [value for _, value in slots]
+        guards = guard_tokens(normalized)
+
+        with self.lock:
+            if not self.entries:
+                return None
+
+            query = vectorize(normalized)
+            weights = {feature: count * self.idf(feature) for feature, count in query.items()}
+            query_norm = math.sqrt(sum(weight ** 2 for weight in weights.values()))
+            if not query_norm:
+                return None
+
+            scores = Counter()
+            for feature, weight in weights.items():
+                for key in self.postings.get(feature, ()):
+                    scores[key] += weight * self.entries[key]['vector'][feature] * self.idf(feature)
+
+            best_key, best_score = None, 0.0
+            for key, dot in scores.items():
+                entry = self.entries[key]
+                if entry['slot_kinds'] != kinds:
+                    continue
+                if entry['exact_slots'] and entry['slot_values'] != values:
+                    continue
+                # "not in brooklyn" must never be answered with the "in brooklyn" query
+                if entry['guards'] != guards:
+                    continue
+                score = dot / (query_norm * self.norm(key))
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None or best_score < self.threshold:
+                return None
+
+            self.entries.move_to_end(best_key)
+            entry = self.entries[best_key]
+
+        cypher = entry['template']
+        for i, value in enumerate(values):
+            cypher = re.sub(r'\{\{slot%d:(\w+)\}\}' % i, lambda m: match_case(m.group(1), value), cypher)
+        return cypher
+
+    def store(self, question: str, cypher: str) -> None:
+        """remembers the cypher that answered a question"""
+        normalized, slots = normalize_question(question)
+        template = cypher
+        exact = False
+
+        # replace each slot literal in the cypher with a placeholder that remembers its case
+        for i, (_, value) in enumerate(slots):
+            pattern = re.compile(r'\b' + re.escape(value) + r'\b', re.IGNORECASE)
+            if not pattern.search(template):
+                exact = True
+                continue
+            template = pattern.sub(lambda m: '{{slot%d:%s}}' % (i, case_style(m.group(0))), template)
+
+        entry = {
+            'question': question,
+            'normalized': normalized,
+            'slot_kinds': [kind for kind, _ in slots],
+            'slot_values': [value for _, value in slots],
+            'template': template,
+            'exact_slots': exact
+        }
+        key = normalized + '|' + '|'.join(entry['slot_values'])
+
+        with self.lock:
+            if key in self.entries:
+                self.remove_entry(key)
+            self.add_entry(key, entry)
+            while len(self.entries) > self.max_entries:
+                self.remove_entry(next(iter(self.entries)))
+        self.save()
+
+    def validate_schema(self, fingerprint: str) -> None:
+        """drops every entry when the graph schema has changed since they were cached"""
+        with self.lock:
+            if self.schema_fingerprint == fingerprint:
+                return
+            changed = self.schema_fingerprint is not None or bool(self.entries)
+            self.schema_fingerprint = fingerprint
+            if changed:
+                self.entries.clear()
+                self.document_frequency.clear()
+                self.postings.clear()
+                self.norms.clear()
+        if changed:
+            self.save()
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.document_frequency.clear()
+            self.postings.clear()
+            self.norms.clear()
+        self.save()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        self.schema_fingerprint = data.get('schema_fingerprint')
+        for entry in data.get('entries', [])[-self.max_entries:]:
+            key = entry['normalized'] + '|' + '|'.join(entry['slot_values'])
+            self.add_entry(key, entry)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self.lock:
+            data = {
+                'schema_fingerprint': self.schema_fingerprint,
+                'entries': [
+                    {k: v for k, v in entry.items() if k not in ('vector', 'guards')}
+                    for entry in self.entries.values()
+                ]
+            }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+
+
+_cache = None
+
+
+def get_question_cache():
+    """returns the shared question cache, or None when it is disabled"""
+    global _cache
+    if not QUESTION_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = QuestionCache(QUESTION_CACHE_PATH, QUESTION_CACHE_MAX_ENTRIES, QUESTION_CACHE_THRESHOLD)
+    return _cache
@@ -1,108 +1,189 @@
 import json
 import os
 import sys
+import threading
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.neo4j_service import run_cypher_real
+from config.settings import SCHEMA_SAMPLE_SIZE, SCHEMA_SAMPLES_PER_LABEL, SCHEMA_PROPERTY_DISCOVERY
 
 
-def discover_node_types():
-    query = """
-    MATCH (n) 
-    WITH labels(n) as labels, keys(n) as props, count(*) as count
-    WHERE size(labels) > 0
-    RETURN labels, props, count
-    ORDER BY count DESC
+def run_discovery_query(query: str, parameters: dict = None) -> list:
+    """runs a discovery query and raises instead of returning an error record"""
+    results = run_cypher_real(query, parameters)
+    if results and results[0].get('status') == 'database_error':
+        raise RuntimeError(results[0].get('message', 'database error'))
+    return results
+
+
+def quote_name(name: str) -> str:
+    """backtick-quotes a label or relationship type for use in a pattern"""
+    return '`' + name.replace('`', '``') + '`'
+
+
+def build_catalog_query() -> str:
+    """labels, types, patterns and totals in one round trip, none of it scans the graph"""
+    parts = [
+        "CALL { CALL db.labels() YIELD label RETURN collect(label) AS labels }",
+        "CALL { CALL db.relationshipTypes() YIELD relationshipType RETURN collect(relationshipType) AS types }",
+        "CALL { CALL db.schema.visualization() YIELD relationships "
+        "UNWIND relationships AS rel "
+        "RETURN collect(DISTINCT [startNode(rel).name, type(rel), endNode(rel).name]) AS patterns }",
+        "CALL { MATCH (n) RETURN count(n) AS total_nodes }",
+        "CALL { MATCH ()-[r]->() RETURN count(r) AS total_relationships }",
+    ]
+    columns = ["labels", "types", "patterns", "total_nodes", "total_relationships"]
+    
+    if SCHEMA_PROPERTY_DISCOVERY == "procedure":
+        parts.append(
+            "CALL { CALL db.schema.nodeTypeProperties() YIELD nodeLabels, propertyName "
+            "RETURN collect([nodeLabels, propertyName]) AS type_properties }"
+        )
+        columns.append("type_properties")
+    
+    return "\n".join(parts) + "\nRETURN " + ", ".join(columns)
+
+
+def build_details_query(labels: list, rel_types: list, patterns: list) -> str:
+    """per-label counts, property keys and samples plus per-type and per-pattern counts
+
+    every label / type gets its own CALL {} subquery so the whole thing is one round trip,
+    counts are aggregated on their own so the planner answers them from the count store
     """
+    parts = []
     
-    results = run_cypher_real(query)
-    node_types = {}
+    for i, label in enumerate(labels):
+        parts.append(f"CALL {{ MATCH (n:{quote_name(label)}) RETURN count(n) AS node_count_{i} }}")
+        parts.append(
+            f"CALL {{ MATCH (n:{quote_name(label)}) WITH n LIMIT $sample_size "
+            f"WITH collect(n) AS nodes "
+            f"RETURN [x IN nodes[..$samples_per_label] | properties(x)] AS node_samples_{i}, "
+            f"reduce(found = [], x IN nodes | found + [k IN keys(x) WHERE NOT k IN found]) AS node_props_{i} }}"
+        )
     
-    for record in results:
-        labels = record['labels']
-        props = record['props']
-        count = record['count']
-        
-        if labels:
-            primary_label = labels[0]
-            if primary_label not in node_types:
-                node_types[primary_label] = {
-                    'properties': set(),
-                    'count': 0,
-                    'sample_properties': {}
-                }
-            
-            node_types[primary_label]['properties'].update(props)
-            node_types[primary_label]['count'] += count
+    for i, rel_type in enumerate(rel_types):
+        parts.append(f"CALL {{ MATCH ()-[r:{quote_name(rel_type)}]->() RETURN count(r) AS rel_count_{i} }}")
+    
+    for i, (start_label, rel_type, _) in enumerate(patterns):
+        parts.append(
+            f"CALL {{ MATCH (:{quote_name(start_label)})-[r:{quote_name(rel_type)}]->() "
+            f"RETURN count(r) AS pattern_count_{i} }}"
+        )
     
-    for node_type in node_types.values():
-        node_type['properties'] = list(node_type['properties'])
+    def column(prefix, count):
+        return "[" + ", ".join(f"{prefix}_{i}" for i in range(count)) + "]"
     
-    return node_types
+    parts.append(
+        f"RETURN {column('node_count', len(labels))} AS node_counts, "
+        f"{column('node_props', len(labels))} AS node_props, "
+        f"{column('node_samples', len(labels))} AS node_samples, "
+        f"{column('rel_count', len(rel_types))} AS rel_counts, "
+        f"{column('pattern_count', len(patterns))} AS pattern_counts"
+    )
+    return "\n".join(parts)
 
 
-def discover_relationship_types():
-    query = """
-    MATCH (a)-[r]->(b) 
-    WITH type(r) as rel_type, labels(a) as start_labels, labels(b) as end_labels, count(*) as count
-    WHERE size(start_labels) > 0 AND size(end_labels) > 0
-    RETURN rel_type, start_labels[0] as start_label, end_labels[0] as end_label, count
-    ORDER BY count DESC
+_discovery = None
+_discovery_lock = threading.Lock()
+
+
+def discover_schema(refresh: bool = False) -> dict:
+    """one discovery pass shared by every consumer in the process
+
+    two round trips: the catalog (labels, types, patterns, totals) and then all
+    per-label / per-type details batched into a single query
     """
-    
-    results = run_cypher_real(query)
-    relationship_types = {}
-    
-    for record in results:
-        rel_type = record['rel_type']
-        start_label = record['start_label']
-        end_label = record['end_label']
-        count = record['count']
+    global _discovery
+    with _discovery_lock:
+        if _discovery is not None and not refresh:
+            return _discovery
+        
+        catalog = run_discovery_query(build_catalog_query())[0]
+        labels = catalog['labels']
+        rel_types = catalog['types']
+        patterns = [tuple(pattern) for pattern in catalog['patterns']]
+        
+        details = {
+            'node_counts': [], 'node_props': [], 'node_samples': [],
+            'rel_counts': [], 'pattern_counts': []
+        }
+        if labels or rel_types:
+            details = run_discovery_query(
+                build_details_query(labels, rel_types, patterns),
+                {'sample_size': SCHEMA_SAMPLE_SIZE, 'samples_per_label': SCHEMA_SAMPLES_PER_LABEL}
+            )[0]
         
-        if rel_type not in relationship_types:
+        properties = {label: list(props) for label, props in zip(labels, details['node_props'])}
+        if SCHEMA_PROPERTY_DISCOVERY == "procedure":
+            properties = {label: [] for label in labels}
+            for node_labels, property_name in catalog.get('type_properties', []):
+                for label in node_labels or []:
+                    if label in properties and property_name and property_name not in properties[label]:
+                        properties[label].append(property_name)
+        
+        node_counts = dict(zip(labels, details['node_counts']))
+        node_types = {}
+        for label in sorted(labels, key=lambda label: node_counts.get(label, 0), reverse=True):
+            node_types[label] = {
+                'properties': sorted(properties.get(label, [])),
+                'count': node_counts.get(label, 0),
+                'sample_properties': {}
+            }
+        
+        rel_counts = dict(zip(rel_types, details['rel_counts']))
+        relationship_types = {}
+        for rel_type in sorted(rel_types, key=lambda rel_type: rel_counts.get(rel_type, 0), reverse=True):
             relationship_types[rel_type] = {
                 'patterns': [],
-                'count': 0
+                'count': rel_counts.get(rel_type, 0)
             }
         
-        relationship_types[rel_type]['patterns'].append({
-            'start': start_label,
-            'end': end_label,
-            'count': count
-        })
-        relationship_types[rel_type]['count'] += count
-    
-    return relationship_types
+        ranked = sorted(zip(patterns, details['pattern_counts']), key=lambda item: item[1], reverse=True)
+        for (start_label, rel_type, end_label), count in ranked:
+            if rel_type in relationship_types and count > 0:
+                relationship_types[rel_type]['patterns'].append({
+                    'start': start_label,
+                    'end': end_label,
+                    'count': count
+                })
+        
+        _discovery = {
+            'node_types': node_types,
+            'relationship_types': relationship_types,
+            'samples': dict(zip(labels, details['node_samples'])),
+            'total_nodes': catalog['total_nodes'],
+            'total_relationships': catalog['total_relationships']
+        }
+        return _discovery
+
+
+def clear_discovery_cache() -> None:
+    """forget the memoized discovery pass, the next consumer triggers a fresh one"""
+    global _discovery
+    with _discovery_lock:
+        _discovery = None
+
+
+def discover_node_types():
+    return discover_schema()['node_types']
+
+
+def discover_relationship_types():
+    return discover_schema()['relationship_types']
 
 
 def get_sample_data():
-    node_types = discover_node_types()
     samples = {}
     
-    for node_type in node_types.keys():
-        query = f"""
-        MATCH (n:{node_type})
-        RETURN n
-        LIMIT 3
-        """
-        
-        try:
-            results = run_cypher_real(query)
-            samples[node_type] = []
-            
-            for record in results:
-                node = record['n']
-                if hasattr(node, '_properties'):
-                    samples[node_type].append(dict(node._properties))
-                elif hasattr(node, 'items'):
-                    samples[node_type].append(dict(node.items()))
-                else:
-                    samples[node_type].append(str(node))
-        
-        except Exception as e:
-            print(f"Error getting samples for {node_type}: {e}")
-            samples[node_type] = []
+    try:
+        discovered = discover_schema()['samples']
+    except Exception as e:
+        print(f"Error getting samples: {e}")
+        return samples
+    
+    for node_type, records in discovered.items():
+        samples[node_type] = [dict(record) for record in records]
     
     return samples
 
@@ -181,18 +262,14 @@ def generate_schema_description():
 
 
 def get_database_stats():
-    stats = {}
-    
-    result = run_cypher_real("MATCH (n) RETURN count(n) as total_nodes")
-    stats['total_nodes'] = result[0]['total_nodes'] if result else 0
-    
-    result = run_cypher_real("MATCH ()-[r]->() RETURN count(r) as total_relationships")
-    stats['total_relationships'] = result[0]['total_relationships'] if result else 0
-    
-    stats['node_types'] = discover_node_types()
-    stats['relationships'] = discover_relationship_types()
+    discovered = discover_schema()
     
-    return stats
+    return {
+        'total_nodes': discovered['total_nodes'],
+        'total_relationships': discovered['total_relationships'],
+        'node_types': discovered['node_types'],
+        'relationships': discovered['relationship_types']
+    }
 
 
 def main():
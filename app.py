@@ -2,6 +2,7 @@ import sys
 import os
 from agent.agent_runner import answer_question
 from builder.build_graph import run_build_pipeline
+from builder.batch_build import run_batch_build
 
 
 def show_usage():
@@ -11,11 +12,14 @@ def show_usage():
     print("  python app.py <question>                    # ask a question")
     print("  python app.py --build <input_file>          # build knowledge graph")
     print("  python app.py --build <input_file> --ingest # build and ingest to neo4j")
+    print("  python app.py --build <input_file> --full   # rebuild without reusing the last build")
+    print("  python app.py --build-batch <dir|glob> [--ingest] # build one graph from many files")
     print()
     print("examples:")
     print("  python app.py \"who lives in france?\"")
     print("  python app.py --build data/knowledge_graph/sample_input.txt")
     print("  python app.py --build data/knowledge_graph/sample_input.pdf --ingest")
+    print("  python app.py --build-batch \"reports/**/*.pdf\" --ingest")
 
 
 def main():
@@ -23,7 +27,30 @@ def main():
         show_usage()
         return
     
-    if "--build" in sys.argv:
+    if "--build-batch" in sys.argv:
+        batch_index = sys.argv.index("--build-batch")
+        if batch_index + 1 >= len(sys.argv):
+            print("error: --build-batch requires a directory or glob")
+            show_usage()
+            return
+        
+        target = sys.argv[batch_index + 1]
+        ingest_to_neo4j = "--ingest" in sys.argv
+        
+        print("neo4j ai assistant - batch build mode")
+        print("-" * 50)
+        try:
+            run_batch_build(target, ingest_to_neo4j)
+        except Exception as e:
+            print(f"batch build failed: {e}")
+            return
+        
+        print("-" * 50)
+        print("batch build complete!")
+        if not ingest_to_neo4j:
+            print("to ingest to neo4j, run with --ingest flag")
+    
+    elif "--build" in sys.argv:
         try:
             build_index = sys.argv.index("--build")
             if build_index + 1 >= len(sys.argv):
@@ -33,6 +60,7 @@ def main():
             
             input_file = sys.argv[build_index + 1]
             ingest_to_neo4j = "--ingest" in sys.argv
+            incremental = "--full" not in sys.argv
             
             if not os.path.exists(input_file):
                 print(f"error: file not found: {input_file}")
@@ -45,7 +73,7 @@ def main():
             print("-" * 50)
             print()
             
-            run_build_pipeline(input_file, ingest_to_neo4j)
+            run_build_pipeline(input_file, ingest_to_neo4j, incremental)
             
             print()
             print("-" * 50)
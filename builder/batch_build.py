@@ -0,0 +1,383 @@
+import argparse
+import glob
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+# add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from builder.ingest_pdf import iter_file_chunks
+from builder.extract_entities import extract_chunk_safely
+from builder.generate_schema import SchemaBuilder, suggest_schema_renames
+from builder.generate_cypher import generate_cypher_from_schema
+from builder.batch_ingest import ingest_statements
+from builder.build_manifest import item_identity
+from services.llm_cache import get_llm_cache
+from services.llm_service import client
+from config.settings import (
+    SCHEMA_NAME_REFINEMENT, BATCH_READ_WORKERS, BATCH_EXTRACT_WORKERS, BATCH_WRITE_WORKERS, BATCH_QUEUE_SIZE, BATCH_MERGE_ITEMS
+)
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt', '.md')
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "batch_build")
+
+# closes a stage's inbox, one per worker
+STOP = object()
+
+
+def discover_files(target: str) -> list[str]:
+    """supported files under a directory (recursively) or matching a glob, sorted"""
+    if os.path.isdir(target):
+        paths = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(target)
+            for name in names
+        ]
+    else:
+        paths = glob.glob(target, recursive=True)
+    return sorted(path for path in paths if os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS))
+
+
+class StageStats:
+    """items handled and seconds spent working per stage, shared by every worker thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def register(self, name: str, workers: int) -> None:
+        self.stages[name] = {"workers": workers, "items": 0, "busy": 0.0, "errors": 0}
+
+    def record(self, name: str, seconds: float, failed: bool = False) -> None:
+        with self.lock:
+            stage = self.stages[name]
+            stage["items"] += 1
+            stage["busy"] += seconds
+            stage["errors"] += int(failed)
+
+    def report(self, elapsed: float) -> dict:
+        """per stage counts plus utilization, the busiest stage is the one limiting throughput"""
+        report = {}
+        for name, stage in self.stages.items():
+            capacity = elapsed * stage["workers"]
+            report[name] = dict(stage, utilization=stage["busy"] / capacity if capacity else 0.0)
+        return report
+
+
+def start_stage(name: str, workers: int, work, inbox: queue.Queue, outbox, consumers: int,
+                stats: StageStats, finish=None) -> threading.Thread:
+    """runs work(item, emit) on worker threads until the inbox is closed
+
+    once every worker is done, finish(emit) flushes any state and the outbox is closed for
+    its consumers; returns the thread that does the closing
+    """
+    stats.register(name, workers)
+    emit = outbox.put if outbox is not None else None
+
+    def worker():
+        while True:
+            item = inbox.get()
+            if item is STOP:
+                return
+            start = time.perf_counter()
+            failed = False
+            try:
+                work(item, emit)
+            except Exception as e:
+                failed = True
+                print(f"{name} stage error: {e}")
+            stats.record(name, time.perf_counter() - start, failed)
+
+    threads = [threading.Thread(target=worker, name=f"{name}-{index}", daemon=True) for index in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    def close():
+        for thread in threads:
+            thread.join()
+        if finish is not None:
+            finish(emit)
+        if outbox is not None:
+            for _ in range(consumers):
+                outbox.put(STOP)
+
+    closer = threading.Thread(target=close, name=f"{name}-close", daemon=True)
+    closer.start()
+    return closer
+
+
+def read_file(path: str, emit) -> None:
+    """read stage: streams one file's chunks downstream, then how many there were"""
+    count = 0
+    error = None
+    try:
+        for count, chunk in enumerate(iter_file_chunks(path), 1):
+            emit(("chunk", path, count - 1, chunk))
+    except Exception as e:
+        error = str(e)
+        print(f"error reading {path}: {e}")
+    emit(("end", path, count, error))
+
+
+def extract_chunk(message: tuple, emit) -> None:
+    """extract stage: swaps a chunk's text for its entities (None when extraction failed), end markers pass straight through"""
+    if message[0] == "chunk":
+        kind, path, index, chunk = message
+        emit((kind, path, index, extract_chunk_safely(chunk)))
+    else:
+        emit(message)
+
+
+class BatchMerger:
+    """merge stage: reassembles each file in chunk order and forwards items not seen before
+
+    runs on a single thread; relationships whose nodes have not been seen yet wait until a
+    later file supplies them, and every batch carries the nodes its relationships need
+    """
+
+    def __init__(self, entities_file, file_count: int, batch_items: int = BATCH_MERGE_ITEMS):
+        self.entities_file = entities_file
+        self.file_count = file_count
+        self.batch_items = batch_items
+        self.partial = {}
+        self.expected = {}
+        self.seen = set()
+        self.nodes = {}
+        self.pending = []
+        self.deferred = []
+        self.files = []
+
+    def add(self, message: tuple, emit) -> None:
+        kind, path, value, payload = message
+        chunks = self.partial.setdefault(path, {})
+        if kind == "chunk":
+            chunks[value] = payload
+        else:
+            self.expected[path] = (value, payload)
+
+        if path in self.expected and len(chunks) == self.expected[path][0]:
+            self.complete_file(path, emit)
+
+    def complete_file(self, path: str, emit) -> None:
+        count, error = self.expected.pop(path)
+        chunks = self.partial.pop(path)
+        failed = sum(1 for entities in chunks.values() if entities is None)
+        items = [item for index in sorted(chunks) for item in chunks[index] or []]
+        if failed and not error:
+            error = f"extraction failed for {failed} of {count} chunks"
+
+        new_items = 0
+        for item in items:
+            identity = item_identity(item)
+            if identity in self.seen:
+                continue
+            self.seen.add(identity)
+            new_items += 1
+            self.entities_file.write(json.dumps({"source": path, **item}) + "\n")
+            if "entity" in item:
+                self.nodes.setdefault(item.get("name"), item)
+            self.pending.append(item)
+
+        self.files.append({"file": path, "chunks": count, "failed_chunks": failed, "items": len(items),
+                           "new_items": new_items, "error": error})
+        print(f"[{len(self.files)}/{self.file_count}] {path}: {count} chunks, {len(items)} entities/relationships ({new_items} new)")
+        if failed:
+            print(f"warning: extraction failed for {failed} chunks of {path}, rebuild to retry them")
+
+        if len(self.pending) >= self.batch_items:
+            self.flush(emit)
+
+    def flush(self, emit, final: bool = False) -> None:
+        """sends pending items downstream in batches, each with the nodes its relationships need"""
+        batch = []
+        included = set()
+        waiting = []
+
+        def add_node(node):
+            identity = item_identity(node)
+            if identity not in included:
+                included.add(identity)
+                batch.append(node)
+
+        for item in self.deferred + self.pending:
+            if len(batch) >= self.batch_items:
+                emit(batch)
+                batch = []
+                included = set()
+
+            if "relationship" not in item:
+                add_node(item)
+                continue
+
+            endpoints = [self.nodes.get(item.get("from")), self.nodes.get(item.get("to"))]
+            if not final and None in endpoints:
+                waiting.append(item)
+                continue
+            for node in endpoints:
+                if node is not None:
+                    add_node(node)
+            batch.append(item)
+
+        if batch:
+            emit(batch)
+        self.deferred = waiting
+        self.pending = []
+
+    def finish(self, emit) -> None:
+        for path in list(self.expected):
+            # a file whose chunks did not all arrive is merged with what there is
+            self.expected[path] = (len(self.partial.get(path, {})), "incomplete")
+            self.complete_file(path, emit)
+        self.flush(emit, final=True)
+
+
+class BatchWriter:
+    """write stage: schema and cypher for each merged batch, ingested when asked to
+
+    one SchemaBuilder sees every batch, so relationship endpoints resolve across batches
+    """
+
+    def __init__(self, cypher_file, ingest_to_neo4j: bool):
+        self.cypher_file = cypher_file
+        self.ingest_to_neo4j = ingest_to_neo4j
+        self.lock = threading.Lock()
+        self.schema_builder = SchemaBuilder()
+        self.statements = 0
+        self.written = 0
+        self.failures = []
+
+    def write(self, batch: list, emit) -> None:
+        with self.lock:
+            schema = self.schema_builder.add(batch).schema()
+
+        cypher = generate_cypher_from_schema(schema, batch)
+        statements = [stmt.strip() for stmt in cypher.split(';') if stmt.strip()]
+        with self.lock:
+            self.cypher_file.write(cypher.rstrip() + "\n")
+            self.statements += len(statements)
+
+        if self.ingest_to_neo4j and statements:
+            report = ingest_statements(statements, verbose=False)
+            with self.lock:
+                self.written += report['written']
+                self.failures.extend(report['failed'])
+
+    def schema(self) -> dict:
+        return self.schema_builder.schema()
+
+    def suggested_renames(self, schema: dict):
+        """llm label / type renames, only reported: every batch was already written with the inferred names"""
+        if not (SCHEMA_NAME_REFINEMENT and client and schema["nodes"]):
+            return None
+        labels, relationships = suggest_schema_renames(schema)
+        return {"labels": labels, "relationships": relationships}
+
+
+def run_batch_build(target: str, ingest_to_neo4j: bool = False, output_dir: str = DEFAULT_OUTPUT_DIR,
+                    read_workers: int = BATCH_READ_WORKERS, extract_workers: int = BATCH_EXTRACT_WORKERS,
+                    write_workers: int = BATCH_WRITE_WORKERS, queue_size: int = BATCH_QUEUE_SIZE) -> dict:
+    """builds one graph from every supported file under a directory or glob
+
+    files stream through read -> extract -> merge -> write stages on threads joined by bounded
+    queues, so throughput is set by the slowest stage; every llm call shares the process wide
+    rate limiter. writes entities.jsonl, schema.json, cypher.cypher and report.json to output_dir
+    """
+    files = discover_files(target)
+    if not files:
+        raise FileNotFoundError(f"no {', '.join(SUPPORTED_EXTENSIONS)} files found for: {target}")
+    print(f"batch build of {len(files)} files with {read_workers} read, {extract_workers} extract "
+          f"and {write_workers} write workers")
+
+    os.makedirs(output_dir, exist_ok=True)
+    stats = StageStats()
+    start = time.perf_counter()
+
+    file_queue = queue.Queue()
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    result_queue = queue.Queue(maxsize=queue_size)
+    batch_queue = queue.Queue(maxsize=max(1, write_workers * 2))
+
+    with open(os.path.join(output_dir, "entities.jsonl"), "w") as entities_file, \
+            open(os.path.join(output_dir, "cypher.cypher"), "w") as cypher_file:
+        merger = BatchMerger(entities_file, len(files))
+        writer = BatchWriter(cypher_file, ingest_to_neo4j)
+
+        stages = [
+            start_stage("read", read_workers, read_file, file_queue, chunk_queue, extract_workers, stats),
+            start_stage("extract", extract_workers, extract_chunk, chunk_queue, result_queue, 1, stats),
+            start_stage("merge", 1, merger.add, result_queue, batch_queue, write_workers, stats, merger.finish),
+            start_stage("write", write_workers, writer.write, batch_queue, None, 0, stats),
+        ]
+
+        for path in files:
+            file_queue.put(path)
+        for _ in range(read_workers):
+            file_queue.put(STOP)
+        for stage in stages:
+            stage.join()
+
+    elapsed = time.perf_counter() - start
+    schema = writer.schema()
+    with open(os.path.join(output_dir, "schema.json"), "w") as f:
+        json.dump(schema, f, indent=2)
+    renames = writer.suggested_renames(schema)
+
+    report = {
+        "target": target,
+        "files": merger.files,
+        "items": len(merger.seen),
+        "failed_chunks": sum(file["failed_chunks"] for file in merger.files),
+        "statements": writer.statements,
+        "written": writer.written,
+        "failed": writer.failures,
+        "seconds": elapsed,
+        "stages": stats.report(elapsed),
+    }
+    if renames is not None:
+        report["suggested_renames"] = renames
+    with open(os.path.join(output_dir, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nbatch build finished in {elapsed:.1f}s: {len(merger.seen)} unique entities/relationships, "
+          f"{writer.statements} cypher statements")
+    if report["failed_chunks"]:
+        incomplete = sum(1 for file in merger.files if file["failed_chunks"])
+        print(f"warning: extraction failed for {report['failed_chunks']} chunks in {incomplete} files, see report.json")
+    if ingest_to_neo4j:
+        print(f"ingested {writer.written} statements, {len(writer.failures)} failed")
+    if renames and (renames["labels"] or renames["relationships"]):
+        print(f"suggested renames (not applied) in report.json: {len(renames['labels'])} labels, "
+              f"{len(renames['relationships'])} relationship types")
+    for name, stage in report["stages"].items():
+        print(f"  {name:8} {stage['workers']} workers  {stage['items']:6} items  "
+              f"{stage['busy']:7.1f}s busy  {stage['utilization']:.0%} utilized")
+    cache = get_llm_cache()
+    if cache:
+        cache_stats = cache.stats()
+        print(f"llm cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    print(f"outputs saved to: {output_dir}")
+    return report
+
+
+def main():
+    """cli entry point for batch_build.py"""
+    parser = argparse.ArgumentParser(description="build one knowledge graph from a directory or glob of documents")
+    parser.add_argument("target", help="directory (searched recursively) or glob of .pdf, .txt and .md files")
+    parser.add_argument("--ingest", action="store_true", help="ingest into neo4j as batches are merged")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR, help="directory for the consolidated outputs")
+    parser.add_argument("--read-workers", type=int, default=BATCH_READ_WORKERS)
+    parser.add_argument("--extract-workers", type=int, default=BATCH_EXTRACT_WORKERS)
+    parser.add_argument("--write-workers", type=int, default=BATCH_WRITE_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=BATCH_QUEUE_SIZE, help="bound on the queues between stages")
+    args = parser.parse_args()
+
+    run_batch_build(args.target, args.ingest, args.output, max(1, args.read_workers),
+                    max(1, args.extract_workers), max(1, args.write_workers), max(1, args.queue_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import json
+import os
+import re
+import sys
+import time
+
+# add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from neo4j.exceptions import TransientError, ServiceUnavailable, SessionExpired
+from services.neo4j_service import run_write_transaction
+from config.settings import INGEST_BATCH_SIZE, INGEST_MAX_RETRIES, INGEST_RETRY_BACKOFF
+
+# MERGE (a:Person {name: "Alice", age: 30})
+NODE_MERGE_PATTERN = re.compile(
+    r'^MERGE\s*\(\s*\w*\s*:\s*`?(\w+)`?\s*(\{.*\})\s*\)\s*;?$',
+    re.DOTALL | re.IGNORECASE
+)
+
+# MATCH (a:Person {name: "Alice"}), (b:Company {name: "Acme"}) MERGE (a)-[:WORKS_FOR]->(b)
+REL_MERGE_PATTERN = re.compile(
+    r'^MATCH\s*\(\s*(\w+)\s*:\s*`?(\w+)`?\s*(\{.*?\})\s*\)\s*,\s*'
+    r'\(\s*(\w+)\s*:\s*`?(\w+)`?\s*(\{.*?\})\s*\)\s*'
+    r'MERGE\s*\(\s*(\w+)\s*\)\s*-\s*\[\s*\w*\s*:\s*`?(\w+)`?\s*\]\s*->\s*\(\s*(\w+)\s*\)\s*;?$',
+    re.DOTALL | re.IGNORECASE
+)
+
+IDENTIFIER_PATTERN = re.compile(r'`([^`]+)`|([A-Za-z_][A-Za-z0-9_]*)')
+
+# errors worth waiting out, anything else (syntax errors, constraint violations) fails the same way again
+RETRYABLE_ERRORS = (TransientError, ServiceUnavailable, SessionExpired)
+
+CYPHER_ESCAPES = {'"': '"', "'": "'", '\\': '\\', 'n': '\n', 't': '\t', 'r': '\r'}
+
+
+def parse_map_literal(text: str):
+    """parses a cypher map literal like {name: "Alice", age: 30} into a dict
+
+    returns None when the literal uses anything beyond plain values and lists
+    """
+    out = []
+    stack = []
+    i = 0
+    n = len(text)
+
+    while i < n:
+        char = text[i]
+
+        if char in ('"', "'"):
+            # read a quoted string and re-encode it as json
+            value = []
+            i += 1
+            while i < n and text[i] != char:
+                if text[i] == '\\' and i + 1 < n:
+                    value.append(CYPHER_ESCAPES.get(text[i + 1], text[i + 1]))
+                    i += 2
+                    continue
+                value.append(text[i])
+                i += 1
+            if i >= n:
+                return None
+            out.append(json.dumps(''.join(value)))
+            i += 1
+            continue
+
+        if char in '{[':
+            stack.append(char)
+        elif char in '}]':
+            if not stack:
+                return None
+            stack.pop()
+
+        out.append(char)
+        i += 1
+
+        # map keys follow an opening brace or a comma inside a map
+        if char in '{,' and stack and stack[-1] == '{':
+            while i < n and text[i].isspace():
+                i += 1
+            match = IDENTIFIER_PATTERN.match(text, i)
+            if not match:
+                continue
+            key = match.group(1) or match.group(2)
+            j = match.end()
+            while j < n and text[j].isspace():
+                j += 1
+            if j >= n or text[j] != ':':
+                return None
+            out.append(json.dumps(key) + ':')
+            i = j + 1
+
+    try:
+        value = json.loads(''.join(out))
+    except json.JSONDecodeError:
+        return None
+
+    return value if isinstance(value, dict) else None
+
+
+def quote_name(name: str) -> str:
+    """backtick-quotes a label, relationship type or property key"""
+    return '`' + name.replace('`', '``') + '`'
+
+
+def map_projection(keys: tuple, source: str) -> str:
+    """builds {key: source.key, ...} for a batch query"""
+    return '{' + ', '.join(f"{quote_name(key)}: {source}.{quote_name(key)}" for key in keys) + '}'
+
+
+def classify_statement(statement: str):
+    """returns (group_key, query, row) for batchable statements or None"""
+    match = NODE_MERGE_PATTERN.match(statement)
+    if match:
+        label, props_text = match.groups()
+        props = parse_map_literal(props_text)
+        if props:
+            keys = tuple(sorted(props))
+            query = f"UNWIND $rows AS row MERGE (n:{quote_name(label)} {map_projection(keys, 'row')})"
+            return ('node', label, keys), query, props
+        return None
+
+    match = REL_MERGE_PATTERN.match(statement)
+    if match:
+        var_a, label_a, props_a, var_b, label_b, props_b, from_var, rel_type, to_var = match.groups()
+        props_a = parse_map_literal(props_a)
+        props_b = parse_map_literal(props_b)
+        if not props_a or not props_b or var_a == var_b:
+            return None
+
+        nodes = {var_a: (label_a, props_a), var_b: (label_b, props_b)}
+        if from_var not in nodes or to_var not in nodes or from_var == to_var:
+            return None
+
+        start_label, start_props = nodes[from_var]
+        end_label, end_props = nodes[to_var]
+        start_keys = tuple(sorted(start_props))
+        end_keys = tuple(sorted(end_props))
+        query = (
+            "UNWIND $rows AS row "
+            f"MATCH (a:{quote_name(start_label)} {map_projection(start_keys, 'row.start')}) "
+            f"MATCH (b:{quote_name(end_label)} {map_projection(end_keys, 'row.end')}) "
+            f"MERGE (a)-[:{quote_name(rel_type)}]->(b)"
+        )
+        group_key = ('rel', rel_type, start_label, start_keys, end_label, end_keys)
+        return group_key, query, {'start': start_props, 'end': end_props}
+
+    return None
+
+
+def plan_batches(statements: list[str]) -> list[dict]:
+    """groups statements into unwind batches per label / relationship type
+
+    order: node merges, other node statements, relationship merges, other relationship statements
+    """
+    groups = {}
+    raw_nodes = {'kind': 'raw', 'name': 'node statements', 'query': None, 'items': []}
+    raw_rels = {'kind': 'raw', 'name': 'relationship statements', 'query': None, 'items': []}
+
+    for statement in statements:
+        classified = classify_statement(statement)
+        if classified:
+            group_key, query, row = classified
+            if group_key not in groups:
+                groups[group_key] = {'kind': group_key[0], 'name': group_key[1], 'query': query, 'items': []}
+            groups[group_key]['items'].append((statement, row))
+        elif '-[' in statement:
+            raw_rels['items'].append((statement, None))
+        else:
+            raw_nodes['items'].append((statement, None))
+
+    node_groups = [group for key, group in groups.items() if key[0] == 'node']
+    rel_groups = [group for key, group in groups.items() if key[0] == 'rel']
+
+    plan = node_groups + [raw_nodes] + rel_groups + [raw_rels]
+    return [group for group in plan if group['items']]
+
+
+def build_transaction(group: dict, items: list) -> list:
+    """turns a slice of a group into (query, parameters) pairs for one transaction"""
+    if group['kind'] == 'raw':
+        return [(statement, None) for statement, _ in items]
+    return [(group['query'], {'rows': [row for _, row in items]})]
+
+
+def write_with_recovery(group: dict, items: list, failures: list,
+                        max_retries: int = INGEST_MAX_RETRIES,
+                        backoff: float = INGEST_RETRY_BACKOFF) -> int:
+    """writes items in one transaction, retrying transient errors with backoff, bisecting to find bad statements"""
+    last_error = None
+
+    for attempt in range(max_retries + 1):
+        try:
+            run_write_transaction(build_transaction(group, items))
+            return len(items)
+        except RETRYABLE_ERRORS as e:
+            last_error = e
+            if attempt < max_retries:
+                time.sleep(backoff * (2 ** attempt))
+        except Exception as e:
+            # a bad statement fails on every attempt, split straight away
+            last_error = e
+            break
+
+    if len(items) == 1:
+        failures.append({'statement': items[0][0], 'error': str(last_error)})
+        return 0
+
+    # split the batch - halves are only retried when the failure was not already a transient one
+    retries = 0 if isinstance(last_error, RETRYABLE_ERRORS) else max_retries
+    middle = len(items) // 2
+    written = write_with_recovery(group, items[:middle], failures, retries, backoff)
+    written += write_with_recovery(group, items[middle:], failures, retries, backoff)
+    return written
+
+
+def ingest_statements(statements: list[str], batch_size: int = INGEST_BATCH_SIZE, verbose: bool = True) -> dict:
+    """ingests cypher statements as batched write transactions"""
+    plan = plan_batches(statements)
+    failures = []
+    written = 0
+    transactions = 0
+    start = time.perf_counter()
+
+    batched = sum(len(group['items']) for group in plan if group['kind'] != 'raw')
+    if verbose:
+        print(f"planned {len(plan)} statement groups ({batched}/{len(statements)} statements batched with unwind)")
+
+    for group in plan:
+        items = group['items']
+        group_start = time.perf_counter()
+        group_written = 0
+
+        for i in range(0, len(items), batch_size):
+            group_written += write_with_recovery(group, items[i:i + batch_size], failures)
+            transactions += 1
+
+        elapsed = time.perf_counter() - group_start
+        rate = group_written / elapsed if elapsed > 0 else float(group_written)
+        if verbose:
+            print(f"  {group['kind']} {group['name']}: {group_written}/{len(items)} rows ({rate:.0f} rows/sec)")
+        written += group_written
+
+    elapsed = time.perf_counter() - start
+    return {
+        'statements': len(statements),
+        'written': written,
+        'failed': failures,
+        'transactions': transactions,
+        'seconds': elapsed,
+        'rows_per_second': written / elapsed if elapsed > 0 else float(written)
+    }
+
@@ -6,38 +6,82 @@ from datetime import datetime
 # add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from builder.ingest_pdf import load_and_chunk_file
-from builder.extract_entities import extract_entities_from_chunks
-from builder.generate_schema import generate_schema_from_entities
+from builder.ingest_pdf import iter_file_chunks
+from builder.extract_entities import iter_chunk_entities
+from builder.generate_schema import generate_schema_with_renames, merge_schemas
 from builder.generate_cypher import generate_cypher_from_schema
+from builder.batch_ingest import ingest_statements
+from builder.build_manifest import (
+    load_manifest, save_manifest, cached_chunk_entities, chunk_hash, plan_delta, unique_items, removal_statements
+)
 from services.neo4j_service import run_cypher_real
+from services.llm_cache import get_llm_cache
+from agent.prompt_template import invalidate_schema_snapshot
 
 
-def run_build_pipeline(input_file: str, ingest_to_neo4j: bool = False) -> None:
-    """runs the full build pipeline"""
+def run_build_pipeline(input_file: str, ingest_to_neo4j: bool = False, incremental: bool = True) -> None:
+    """runs the build pipeline, redoing only what changed since the last build of input_file
+
+    the build manifest keeps the entities of every chunk, so only new or changed chunks are
+    extracted, and the items last ingested, so cypher is generated and ingested for the
+    difference only; incremental=False extracts and writes everything again
+    """
     print(f"starting build pipeline for: {input_file}")
     
     try:
-        # load and chunk file
-        print("loading and chunking file...")
-        chunks = load_and_chunk_file(input_file)
-        print(f"created {len(chunks)} chunks")
+        manifest = load_manifest(input_file)
+        known = cached_chunk_entities(manifest) if incremental else {}
         
-        # extract entities from chunks
-        print("extracting entities...")
-        entities = extract_entities_from_chunks(chunks)
+        # chunks stream from the file straight into extraction, unchanged chunks are skipped
+        print("loading, chunking and extracting entities...")
+        chunks = ChangedChunks(iter_file_chunks(input_file), known)
+        failed = set()
+        for digest, chunk_entities in zip(chunks.changed, list(iter_chunk_entities(chunks))):
+            if chunk_entities is None:
+                failed.add(digest)
+            else:
+                known[digest] = chunk_entities
+        entities = [item for digest in chunks.hashes for item in known.get(digest, [])]
+        print(f"created {len(chunks.hashes)} chunks ({len(chunks.changed)} new or changed)")
+        if failed:
+            print(f"warning: extraction failed for {len(failed)} chunks, they are retried on the next build")
         print(f"extracted {len(entities)} entities/relationships")
         
-        # generate schema from entities
-        print("generating schema...")
-        schema = generate_schema_from_entities(entities)
+        graph_items = manifest.get("graph", [])
+        affected, removed = plan_delta(graph_items, entities)
+        if not incremental:
+            affected = list(unique_items(entities).values())
+        if graph_items:
+            print(f"{len(affected)} entities/relationships to write, {len(removed)} to remove since the last ingest")
+        
+        # generate schema from the affected entities, folded into the previous schema
+        # renames refinement applied in earlier builds, kept so removals can find renamed labels
+        previous_schema = manifest.get("schema") if incremental else None
+        renames = manifest.get("renames") or {"labels": {}, "relationships": {}}
+        if previous_schema is not None and not affected:
+            schema = previous_schema
+        else:
+            print("generating schema...")
+            schema, label_renames, type_renames = generate_schema_with_renames(affected)
+            renames = {
+                "labels": {**renames.get("labels", {}), **label_renames},
+                "relationships": {**renames.get("relationships", {}), **type_renames},
+            }
+            if previous_schema:
+                schema = merge_schemas(previous_schema, schema)
         node_count = len(schema.get("nodes", {}))
         edge_count = len(schema.get("edges", {}))
-        print(f"generated schema with {node_count} node types and {edge_count} edge types")
+        print(f"schema has {node_count} node types and {edge_count} edge types")
         
-        # generate cypher from schema and entities
-        print("generating cypher...")
-        cypher = generate_cypher_from_schema(schema, entities)
+        # generate cypher for the affected entities only
+        removal_cypher = "".join(
+            f"{statement};\n" for statement in removal_statements(removed, graph_items + entities, renames)
+        )
+        addition_cypher = ""
+        if affected:
+            print("generating cypher...")
+            addition_cypher = generate_cypher_from_schema(schema, affected)
+        cypher = removal_cypher + addition_cypher
         cypher_lines = len([line for line in cypher.split('\n') if line.strip()])
         print(f"generated {cypher_lines} cypher statements")
         
@@ -45,13 +89,35 @@ def run_build_pipeline(input_file: str, ingest_to_neo4j: bool = False) -> None:
         print("saving outputs...")
         save_pipeline_outputs(entities, schema, cypher, input_file)
         
-        # ingest to neo4j if requested
+        # ingest to neo4j if requested, removals first so re-created nodes are not deleted
+        ingested = False
         if ingest_to_neo4j:
             print("ingesting to neo4j...")
-            ingest_cypher_to_neo4j(cypher)
+            error_count = 0
+            if removal_cypher:
+                error_count += ingest_cypher_to_neo4j(removal_cypher)
+            if addition_cypher.strip():
+                error_count += ingest_cypher_to_neo4j(addition_cypher)
+            ingested = error_count == 0
+            invalidate_schema_snapshot()
+        
+        # the graph state only advances when everything was written
+        manifest_file = save_manifest(input_file, {
+            # failed chunks are left out so the next build extracts them again
+            "chunks": [{"hash": digest, "entities": known[digest]} for digest in dict.fromkeys(chunks.hashes)
+                       if digest in known],
+            "schema": schema,
+            "renames": renames,
+            "graph": entities if ingested else graph_items,
+        })
+        print(f"build manifest saved to: {manifest_file}")
         
         print("pipeline completed successfully!")
         print("outputs saved to data/ directory")
+        cache = get_llm_cache()
+        if cache:
+            stats = cache.stats()
+            print(f"llm cache: {stats['hits']} hits, {stats['misses']} misses ({stats['entries']} entries stored)")
         if ingest_to_neo4j:
             print("data ingested to neo4j database")
         
@@ -60,36 +126,43 @@ def run_build_pipeline(input_file: str, ingest_to_neo4j: bool = False) -> None:
         raise
 
 
-def ingest_cypher_to_neo4j(cypher: str) -> None:
-    """executes cypher statements in neo4j"""
+class ChangedChunks:
+    """passes on only the chunks without known entities, recording every chunk hash in order"""
+
+    def __init__(self, chunks, known: dict):
+        self.chunks = chunks
+        self.known = known
+        self.hashes = []
+        self.changed = []
+
+    def __iter__(self):
+        pending = set()
+        for chunk in self.chunks:
+            digest = chunk_hash(chunk)
+            self.hashes.append(digest)
+            if digest in self.known or digest in pending:
+                continue
+            pending.add(digest)
+            self.changed.append(digest)
+            yield chunk
+
+
+def ingest_cypher_to_neo4j(cypher: str) -> int:
+    """executes cypher statements in neo4j as batched write transactions, returns the number that failed"""
     # split cypher into individual statements
     statements = [stmt.strip() for stmt in cypher.split(';') if stmt.strip()]
     
     print(f"ingesting {len(statements)} cypher statements...")
     
-    success_count = 0
-    error_count = 0
-    
-    for i, statement in enumerate(statements):
-        try:
-            print(f"executing statement {i+1}/{len(statements)}: {statement[:50]}...")
-            result = run_cypher_real(statement)
-            
-            # check if result indicates an error
-            if result and isinstance(result, list) and len(result) > 0:
-                if isinstance(result[0], dict) and result[0].get("status") == "database_error":
-                    print(f"error in statement {i+1}: {result[0].get('message', 'unknown error')}")
-                    error_count += 1
-                else:
-                    success_count += 1
-            else:
-                success_count += 1
-                
-        except Exception as e:
-            print(f"error executing statement {i+1}: {e}")
-            error_count += 1
+    report = ingest_statements(statements)
+    error_count = len(report['failed'])
+    success_count = report['written']
+    
+    for failure in report['failed']:
+        print(f"error in statement: {failure['statement'][:80]}... - {failure['error']}")
     
     print(f"ingestion complete: {success_count} successful, {error_count} errors")
+    print(f"{report['transactions']} transactions in {report['seconds']:.2f}s ({report['rows_per_second']:.0f} rows/sec)")
     
     if error_count > 0:
         print("warning: some statements failed to execute")
@@ -102,6 +175,8 @@ def ingest_cypher_to_neo4j(cypher: str) -> None:
             print(f"verification: {total_nodes} total nodes in database")
     except Exception as e:
         print(f"verification query failed: {e}")
+    
+    return error_count
 
 
 def save_pipeline_outputs(entities: list, schema: dict, cypher: str, input_file: str) -> None:
@@ -155,20 +230,22 @@ def save_pipeline_outputs(entities: list, schema: dict, cypher: str, input_file:
 def main():
     """cli entry point for build_graph.py"""
     if len(sys.argv) < 2:
-        print("usage: python build_graph.py <input_file> [--ingest]")
+        print("usage: python build_graph.py <input_file> [--ingest] [--full]")
         print("example: python build_graph.py data/sample_input.txt")
         print("example: python build_graph.py data/sample_input.txt --ingest")
+        print("--full ignores the build manifest and extracts every chunk again")
         return
     
     input_file = sys.argv[1]
     ingest_to_neo4j = "--ingest" in sys.argv
+    incremental = "--full" not in sys.argv
     
     # check if file exists
     if not os.path.exists(input_file):
         print(f"error: file not found: {input_file}")
         return
     
-    run_build_pipeline(input_file, ingest_to_neo4j)
+    run_build_pipeline(input_file, ingest_to_neo4j, incremental)
 
 
 if __name__ == "__main__":
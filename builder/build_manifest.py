@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import sys
+
+# add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import MODEL, USE_MOCK_LLM, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from builder.batch_ingest import quote_name
+from builder.generate_schema import label_name, relationship_type
+
+MANIFEST_VERSION = 1
+MANIFEST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "build_manifests")
+EXTRACTION_PROMPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts", "extract_entities.txt")
+
+
+def manifest_path(input_file: str) -> str:
+    """one manifest per input file, keyed by its absolute path"""
+    absolute = os.path.abspath(input_file)
+    digest = hashlib.sha1(absolute.encode("utf-8")).hexdigest()[:12]
+    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    return os.path.join(MANIFEST_DIR, f"{base_name}_{digest}.json")
+
+
+def extractor_fingerprint() -> str:
+    """changes whenever cached chunk entities could differ: model, prompt or chunking settings"""
+    try:
+        with open(EXTRACTION_PROMPT, "r") as f:
+            prompt = f.read()
+    except FileNotFoundError:
+        prompt = ""
+    parts = [str(MANIFEST_VERSION), MODEL, str(USE_MOCK_LLM), str(CHUNK_MAX_TOKENS), str(CHUNK_OVERLAP_TOKENS), prompt]
+    return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def chunk_hash(chunk: str) -> str:
+    return hashlib.sha1(chunk.encode("utf-8")).hexdigest()
+
+
+def load_manifest(input_file: str) -> dict:
+    """the previous build of input_file, empty when there is none
+
+    holds the entities of every chunk, the merged schema and the items last ingested into neo4j
+    """
+    path = manifest_path(input_file)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"ignoring unreadable build manifest {path}: {e}")
+        return {}
+    return manifest if manifest.get("version") == MANIFEST_VERSION else {}
+
+
+def cached_chunk_entities(manifest: dict) -> dict:
+    """{chunk hash: entities} reusable by this build, empty when extraction settings changed"""
+    if not manifest.get("chunks"):
+        return {}
+    if manifest.get("fingerprint") != extractor_fingerprint():
+        print("extraction settings changed since the last build, extracting every chunk again")
+        return {}
+    return {chunk["hash"]: chunk["entities"] for chunk in manifest["chunks"]}
+
+
+def save_manifest(input_file: str, manifest: dict) -> str:
+    """writes the manifest atomically so an interrupted build leaves the previous one intact"""
+    path = manifest_path(input_file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    manifest = dict(manifest, version=MANIFEST_VERSION, fingerprint=extractor_fingerprint(),
+                    source=os.path.abspath(input_file))
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, path)
+    return path
+
+
+def item_identity(item: dict) -> str:
+    """an extracted entity or relationship as canonical json, so changed attributes count as a change"""
+    return json.dumps(item, sort_keys=True)
+
+
+def unique_items(items: list[dict]) -> dict:
+    """{identity: item} in first-seen order"""
+    unique = {}
+    for item in items:
+        unique.setdefault(item_identity(item), item)
+    return unique
+
+
+def plan_delta(graph_items: list[dict], entities: list[dict]):
+    """compares what is in the graph with what the document now yields
+
+    returns (affected, removed): affected is what cypher has to be generated for - new or changed
+    items, relationships that touch a re-created node, and the nodes those relationships need;
+    removed is what has to be deleted first
+    """
+    old = unique_items(graph_items)
+    new = unique_items(entities)
+
+    added = [item for identity, item in new.items() if identity not in old]
+    removed = [item for identity, item in old.items() if identity not in new]
+
+    # removed nodes are deleted by name with their relationships, so whatever the document
+    # still says about those names is merged again
+    recreated = {item.get("name") for item in removed if "entity" in item}
+    added_identities = {item_identity(item) for item in added}
+    for identity, item in new.items():
+        if identity in added_identities:
+            continue
+        if "entity" in item:
+            touches = item.get("name") in recreated
+        else:
+            touches = item.get("from") in recreated or item.get("to") in recreated
+        if touches:
+            added.append(item)
+            added_identities.add(identity)
+
+    # relationship statements are only generated when both endpoints are in the same batch
+    endpoints = {name for item in added if "relationship" in item for name in (item.get("from"), item.get("to"))}
+    endpoints -= {item.get("name") for item in added if "entity" in item}
+    affected = [item for item in new.values() if "entity" in item and item.get("name") in endpoints
+                and item_identity(item) not in added_identities]
+    return affected + added, removed
+
+
+def cypher_string(value) -> str:
+    return json.dumps(str(value))
+
+
+def schema_names(raw, name_of, renames: dict) -> list:
+    """the names an extracted type can have in the graph: inferred, and renamed by refinement"""
+    name = name_of(raw)
+    return list(dict.fromkeys([name, renames.get(name, name)]))
+
+
+def removal_statements(removed: list[dict], known_items: list[dict] = (), renames: dict = None) -> list[str]:
+    """cypher deleting nodes and relationships that are no longer in the document
+
+    labels and types are mapped the way the schema maps them (see generate_schema), including
+    any renames refinement applied; relationship endpoints are matched by label, looked up in
+    known_items, so the name index is used
+    """
+    renames = renames or {}
+    label_renames = renames.get("labels", {})
+    type_renames = renames.get("relationships", {})
+
+    labels_by_name = {}
+    for item in list(known_items) + list(removed):
+        if "entity" in item:
+            labels = labels_by_name.setdefault(item.get("name"), [])
+            for label in schema_names(item["entity"], label_name, label_renames):
+                if label not in labels:
+                    labels.append(label)
+
+    statements = []
+    deleted_nodes = set()
+    for item in removed:
+        if "entity" in item:
+            deleted_nodes.add(item.get("name"))
+            for label in schema_names(item["entity"], label_name, label_renames):
+                statements.append(
+                    f"MATCH (n:{quote_name(label)} {{name: {cypher_string(item.get('name'))}}}) DETACH DELETE n"
+                )
+    for item in removed:
+        if "relationship" not in item or item.get("from") in deleted_nodes or item.get("to") in deleted_nodes:
+            continue
+        # an endpoint without a known label falls back to an unlabeled match
+        from_labels = labels_by_name.get(item.get("from")) or [None]
+        to_labels = labels_by_name.get(item.get("to")) or [None]
+        for rel_type in schema_names(item["relationship"], relationship_type, type_renames):
+            for from_label in from_labels:
+                for to_label in to_labels:
+                    statements.append(
+                        f"MATCH ({node_pattern('a', from_label, item.get('from'))})"
+                        f"-[r:{quote_name(rel_type)}]->"
+                        f"({node_pattern('b', to_label, item.get('to'))}) DELETE r"
+                    )
+    return statements
+
+
+def node_pattern(variable: str, label, name) -> str:
+    label_part = f":{quote_name(label)}" if label else ""
+    return f"{variable}{label_part} {{name: {cypher_string(name)}}}"
@@ -2,32 +2,68 @@ import json
 import re
 import sys
 import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
 
 # add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.llm_service import client, USE_MOCK_LLM, MODEL, TEMPERATURE
+from services.llm_service import client, chat_completion, USE_MOCK_LLM
+from config.settings import LLM_MAX_WORKERS
 
+EXTRACTION_MAX_TOKENS = 1000
 
-def extract_entities_from_chunks(text_chunks: list[str]) -> list[dict]:
-    """extracts entities from text chunks"""
+
+def extract_entities_from_chunks(text_chunks: Iterable[str], max_workers: int = None) -> list[dict]:
+    """extracts entities from text chunks concurrently, keeping chunk order
+
+    text_chunks can be a generator: chunks are pulled only a few ahead of the workers,
+    so extraction starts while the rest of the document is still being read
+    """
     all_entities = []
-    
-    for chunk in text_chunks:
-        entities = extract_entities_from_text(chunk)
-        all_entities.extend(entities)
-    
+    for entities in iter_chunk_entities(text_chunks, max_workers):
+        all_entities.extend(entities or [])
     return all_entities
 
 
-def extract_entities_from_text(text: str) -> list[dict]:
-    """extracts entities from a single text chunk"""
+def iter_chunk_entities(text_chunks: Iterable[str], max_workers: int = None) -> Iterator[list[dict]]:
+    """yields the entities of each chunk in chunk order, extracting concurrently, None for a failed chunk"""
+    max_workers = max(1, max_workers or LLM_MAX_WORKERS)
+    
+    # results are yielded in submission order regardless of completion order
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for chunk in text_chunks:
+            pending.append(executor.submit(extract_chunk_safely, chunk))
+            if len(pending) >= max_workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def extract_chunk_safely(text: str) -> Optional[list[dict]]:
+    """extracts one chunk, a failure only loses this chunk
+
+    returns None rather than mock entities when the api fails, so callers that cache
+    results by chunk can tell a failed extraction from a chunk with nothing in it
+    """
+    try:
+        return extract_entities_from_text(text, fallback=False)
+    except Exception as e:
+        print(f"error extracting chunk ({len(text)} chars): {e}")
+        return None
+
+
+def extract_entities_from_text(text: str, fallback: bool = True) -> list[dict]:
+    """extracts entities from a single text chunk, falling back to mock extraction when allowed"""
     prompt = load_extraction_prompt(text)
     
     if USE_MOCK_LLM:
         response = extract_entities_mock(text)
     else:
-        response = extract_entities_real(prompt)
+        response = extract_entities_real(prompt, fallback)
     
     return format_entities_output(response)
 
@@ -91,20 +127,19 @@ def extract_entities_mock(text: str) -> str:
     return json.dumps(entities, indent=2)
 
 
-def extract_entities_real(prompt: str) -> str:
-    """real openai api entity extraction"""
+def extract_entities_real(prompt: str, fallback: bool = True) -> str:
+    """real openai api entity extraction, without fallback api errors are raised"""
     if not client:
+        if not fallback:
+            raise RuntimeError("openai client not configured")
         return extract_entities_mock(prompt.split("text to analyze:")[-1])
     
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=TEMPERATURE,
-            max_tokens=1000
-        )
-        return response.choices[0].message.content.strip()
+        # rate limiting and caching happen inside chat_completion
+        return chat_completion(prompt, max_tokens=EXTRACTION_MAX_TOKENS).strip()
     except Exception as e:
+        if not fallback:
+            raise
         # fallback to mock on any api error
         return extract_entities_mock(prompt.split("text to analyze:")[-1])
 
@@ -142,6 +177,16 @@ def main():
     entities = extract_entities_from_chunks([test_text])
     print(f"extracted {len(entities)} entities:")
     print(json.dumps(entities, indent=2))
+    
+    # offline benchmark of the scheduler: python extract_entities.py --bench [chunks]
+    if "--bench" in sys.argv:
+        bench_index = sys.argv.index("--bench")
+        chunk_count = int(sys.argv[bench_index + 1]) if len(sys.argv) > bench_index + 1 else 200
+        start = time.perf_counter()
+        entities = extract_entities_from_chunks([test_text] * chunk_count)
+        elapsed = time.perf_counter() - start
+        print(f"\nbenchmark: {chunk_count} chunks, {len(entities)} entities in {elapsed:.2f}s "
+              f"({chunk_count / elapsed:.1f} chunks/sec, {LLM_MAX_WORKERS} workers)")
 
 
 if __name__ == "__main__":
@@ -6,8 +6,9 @@ import re
 # add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.llm_service import client, generate_cypher as llm_generate_cypher
+from services.llm_service import client, chat_completion, generate_cypher as llm_generate_cypher
 from config.settings import USE_MOCK_LLM
+from builder.generate_schema import label_name, relationship_type
 
 
 def sanitize_property_name(prop_name):
@@ -203,7 +204,8 @@ def generate_cypher_mock(schema: dict, entities: list[dict]) -> str:
     # First pass: create all nodes and assign variables
     for entity in entities:
         if "entity" in entity:
-            entity_type = entity["entity"]
+            # the label the schema gives this type, so removals and the schema agree with the graph
+            entity_type = label_name(entity["entity"])
             entity_name = entity.get("name", "Unknown")
             
             # Skip if we've already seen this entity
@@ -241,7 +243,7 @@ def generate_cypher_mock(schema: dict, entities: list[dict]) -> str:
     # Second pass: create relationships
     for entity in entities:
         if "relationship" in entity:
-            rel_type = entity["relationship"]
+            rel_type = relationship_type(entity["relationship"])
             from_name = entity.get("from", "")
             to_name = entity.get("to", "")
             
@@ -268,15 +270,7 @@ def generate_cypher_real_direct(prompt: str) -> str:
         return generate_cypher_mock({}, [])
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1
-        )
-        
-        return response.choices[0].message.content
+        return chat_completion(prompt, model="gpt-3.5-turbo", temperature=0.1)
     
     except Exception as e:
         print(f"error calling openai: {e}")
@@ -289,15 +283,7 @@ def generate_cypher_real(prompt: str) -> str:
         return generate_cypher_mock({}, [])
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1
-        )
-        
-        return response.choices[0].message.content
+        return chat_completion(prompt, model="gpt-3.5-turbo", temperature=0.1)
     
     except Exception as e:
         print(f"error calling openai: {e}")
@@ -1,145 +1,282 @@
 import json
 import os
+import re
 import sys
+from collections import Counter
 
 # add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.llm_service import client
+from services.llm_service import client, chat_completion
+from config.settings import SCHEMA_NAME_REFINEMENT
 
+# label for relationship endpoints that were never extracted as entities
+UNKNOWN_LABEL = "Entity"
 
-def generate_schema_from_entities(entities: list[dict]) -> dict:
-    """infers graph schema from extracted entities"""
-    try:
-        # load prompt template
-        prompt = load_schema_prompt()
-        
-        # format entities for prompt
-        entities_text = json.dumps(entities, indent=2)
-        formatted_prompt = prompt.format(entities=entities_text)
-        
-        # get schema from llm
-        if os.getenv("USE_MOCK_LLM", "false").lower() == "true":
-            raw_response = generate_schema_mock(entities)
+LABEL_PATTERN = re.compile(r'^[A-Za-z][A-Za-z0-9]*$')
+RELATIONSHIP_PATTERN = re.compile(r'^[A-Z][A-Z0-9_]*$')
+
+
+def generate_schema_from_entities(entities: list[dict], refine: bool = None) -> dict:
+    """infers graph schema from extracted entities
+
+    inference is local and deterministic; with refine (SCHEMA_NAME_REFINEMENT by default) the
+    llm is shown the inferred schema, not the entities, and may only rename labels and types
+    """
+    return generate_schema_with_renames(entities, refine)[0]
+
+
+def generate_schema_with_renames(entities: list[dict], refine: bool = None):
+    """(schema, {inferred label: label}, {inferred type: type}) - the renames refinement applied"""
+    schema = infer_schema(entities)
+    refine = SCHEMA_NAME_REFINEMENT if refine is None else refine
+    if refine and client and schema["nodes"]:
+        labels, relationships = suggest_schema_renames(schema)
+        if labels or relationships:
+            return rename_schema(schema, labels, relationships), labels, relationships
+    return schema, {}, {}
+
+
+def infer_schema(entities: list[dict]) -> dict:
+    """one pass schema inference: node properties and types, relationship endpoint labels"""
+    return SchemaBuilder().add(entities).schema()
+
+
+def label_name(raw) -> str:
+    """PascalCase node label: "machine learning" -> "MachineLearning", "Person" stays"""
+    words = re.findall(r'[A-Za-z0-9]+', str(raw))
+    if not words:
+        return UNKNOWN_LABEL
+    label = ''.join(word[0].upper() + word[1:] for word in words)
+    return label if label[0].isalpha() else UNKNOWN_LABEL + label
+
+
+def relationship_type(raw) -> str:
+    """UPPER_SNAKE relationship type: "works for" -> "WORKS_FOR" """
+    words = re.findall(r'[A-Za-z0-9]+', str(raw))
+    rel_type = '_'.join(word.upper() for word in words) or "RELATED_TO"
+    return rel_type if rel_type[0].isalpha() else "REL_" + rel_type
+
+
+def value_type(value):
+    """property type of an extracted value, None for values that say nothing"""
+    if value is None or value == "" or value == "null":
+        return None
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, list):
+        return "list"
+    if isinstance(value, dict):
+        return "map"
+    return "string"
+
+
+def widen_type(seen, kind):
+    """mixed numbers widen to float, any other mixture to string"""
+    if seen is None or seen == kind:
+        return kind
+    if kind is None:
+        return seen
+    return "float" if {seen, kind} == {"integer", "float"} else "string"
+
+
+class SchemaBuilder:
+    """incremental schema inference, fed one batch of extracted items at a time
+
+    a name -> label index resolves relationship endpoints without rescanning the entities;
+    relationships seen before their nodes are resolved when the schema is read
+    """
+
+    def __init__(self):
+        self.properties = {}
+        self.labels = {}
+        self.pair_counts = {}
+        self.unresolved = []
+
+    def add(self, items: list[dict]) -> "SchemaBuilder":
+        for item in items:
+            if "entity" in item:
+                self.add_entity(item)
+            elif "relationship" in item:
+                self.add_relationship(item)
+        return self
+
+    def add_entity(self, item: dict) -> None:
+        label = label_name(item["entity"])
+        properties = self.properties.setdefault(label, {"name": "string"})
+        self.labels.setdefault(item.get("name"), label)
+
+        attributes = item.get("attributes") or {}
+        if isinstance(attributes, dict):
+            for key, value in attributes.items():
+                properties[key] = widen_type(properties.get(key), value_type(value))
+
+    def add_relationship(self, item: dict) -> None:
+        rel_type = relationship_type(item["relationship"])
+        counts = self.pair_counts.setdefault(rel_type, Counter())
+        from_label = self.labels.get(item.get("from"))
+        to_label = self.labels.get(item.get("to"))
+        if from_label and to_label:
+            counts[(from_label, to_label)] += 1
         else:
-            raw_response = generate_schema_real(formatted_prompt, entities)
-        
-        # parse and return structured format
-        return format_schema_output(raw_response)
-    
-    except Exception as e:
-        print(f"error generating schema: {e}")
-        return {"nodes": {}, "edges": {}}
+            self.unresolved.append((rel_type, item.get("from"), item.get("to")))
+
+    def schema(self) -> dict:
+        """{"nodes": {label: [properties]}, "edges": {type: {"from", "to"}}, "property_types": {...}}
+
+        an edge's from / to is its most common label pair, "pairs" lists every pair when there
+        are several; property types are unset (null) when only empty values were seen
+        """
+        pair_counts = {rel_type: Counter(counts) for rel_type, counts in self.pair_counts.items()}
+        for rel_type, from_name, to_name in self.unresolved:
+            pair = (self.labels.get(from_name, UNKNOWN_LABEL), self.labels.get(to_name, UNKNOWN_LABEL))
+            pair_counts[rel_type][pair] += 1
+
+        edges = {}
+        for rel_type, counts in pair_counts.items():
+            pairs = [pair for pair, _ in counts.most_common()]
+            edge = {"from": pairs[0][0], "to": pairs[0][1]}
+            if len(pairs) > 1:
+                edge["pairs"] = [list(pair) for pair in pairs]
+            edges[rel_type] = edge
+
+        return {
+            "nodes": {label: list(properties) for label, properties in self.properties.items()},
+            "edges": edges,
+            "property_types": {label: dict(properties) for label, properties in self.properties.items()},
+        }
+
+
+def edge_pairs(edge: dict) -> list:
+    return edge.get("pairs") or [[edge.get("from"), edge.get("to")]]
+
+
+def merge_schemas(base: dict, update: dict) -> dict:
+    """folds a schema generated for new entities into an earlier one
+
+    node property lists are unioned in order, property types widen and edge label pairs are
+    unioned keeping the earlier main pair; anything else in update replaces base
+    """
+    merged = {"nodes": dict(base.get("nodes", {})), "edges": dict(base.get("edges", {}))}
+    for label, properties in update.get("nodes", {}).items():
+        existing = merged["nodes"].get(label)
+        if isinstance(existing, list) and isinstance(properties, list):
+            merged["nodes"][label] = existing + [prop for prop in properties if prop not in existing]
+        elif isinstance(existing, dict) and isinstance(properties, dict):
+            merged["nodes"][label] = {**existing, **properties}
+        else:
+            merged["nodes"][label] = properties
+
+    for rel_type, edge in update.get("edges", {}).items():
+        existing = merged["edges"].get(rel_type)
+        if not isinstance(existing, dict) or not isinstance(edge, dict):
+            merged["edges"][rel_type] = edge
+            continue
+        pairs = edge_pairs(existing)
+        pairs = pairs + [pair for pair in edge_pairs(edge) if pair not in pairs]
+        combined = {"from": existing.get("from"), "to": existing.get("to")}
+        if len(pairs) > 1:
+            combined["pairs"] = pairs
+        merged["edges"][rel_type] = combined
+
+    if "property_types" in base or "property_types" in update:
+        types = {label: dict(properties) for label, properties in base.get("property_types", {}).items()}
+        for label, properties in update.get("property_types", {}).items():
+            label_types = types.setdefault(label, {})
+            for key, kind in properties.items():
+                label_types[key] = widen_type(label_types.get(key), kind)
+        merged["property_types"] = types
+    return merged
+
+
+def rename_schema(schema: dict, labels: dict, relationships: dict) -> dict:
+    """applies label and relationship type renames, merging anything renamed onto the same name"""
+    renamed = {"nodes": {}, "edges": {}, "property_types": {}}
+    for label, properties in schema.get("nodes", {}).items():
+        target = labels.get(label, label)
+        types = schema.get("property_types", {}).get(label, {})
+        renamed = merge_schemas(renamed, {"nodes": {target: properties}, "property_types": {target: types}})
+
+    for rel_type, edge in schema.get("edges", {}).items():
+        pairs = []
+        for start, end in edge_pairs(edge):
+            pair = [labels.get(start, start), labels.get(end, end)]
+            if pair not in pairs:
+                pairs.append(pair)
+        new_edge = {"from": pairs[0][0], "to": pairs[0][1]}
+        if len(pairs) > 1:
+            new_edge["pairs"] = pairs
+        renamed = merge_schemas(renamed, {"edges": {relationships.get(rel_type, rel_type): new_edge}})
+    return renamed
 
 
 def load_schema_prompt() -> str:
-    """loads schema generation prompt template"""
+    """loads schema naming refinement prompt template"""
     prompt_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts", "generate_schema.txt")
-    
+
     try:
         with open(prompt_path, "r") as f:
             return f.read()
     except FileNotFoundError:
-        return "generate a graph schema from these entities: {entities}"
-
-
-def generate_schema_mock(entities: list[dict]) -> str:
-    """mock schema generation for testing"""
-    # analyze entities to create schema
-    nodes = {}
-    edges = {}
-    
-    for item in entities:
-        if "entity" in item:
-            entity_type = item["entity"]
-            if entity_type not in nodes:
-                nodes[entity_type] = []
-            
-            # add attributes
-            if "attributes" in item:
-                for attr in item["attributes"]:
-                    if attr not in nodes[entity_type]:
-                        nodes[entity_type].append(attr)
-            
-            # add name as default property
-            if "name" not in nodes[entity_type]:
-                nodes[entity_type].append("name")
-        
-        elif "relationship" in item:
-            rel_type = item["relationship"]
-            if rel_type not in edges:
-                # try to infer from/to types from the entities
-                from_entity = "Entity"
-                to_entity = "Entity"
-                
-                # look for entities with matching names
-                for entity in entities:
-                    if "entity" in entity:
-                        if entity.get("name") == item.get("from"):
-                            from_entity = entity["entity"]
-                        elif entity.get("name") == item.get("to"):
-                            to_entity = entity["entity"]
-                
-                edges[rel_type] = {"from": from_entity, "to": to_entity}
-    
-    schema = {"nodes": nodes, "edges": edges}
-    return json.dumps(schema, indent=2)
-
-
-def generate_schema_real(prompt: str, entities: list[dict] = None) -> str:
-    """real schema generation using openai"""
-    if not client:
-        # Extract entities from prompt if not provided
-        if entities is None:
-            try:
-                # Try to extract entities from the prompt
-                entities_start = prompt.find("extracted entities and relationships:") + len("extracted entities and relationships:")
-                entities_text = prompt[entities_start:].strip()
-                entities = json.loads(entities_text)
-            except:
-                entities = []
-        return generate_schema_mock(entities)
-    
+        return ('suggest clearer names for this graph schema, answering with json like '
+                '{{"labels": {{"Old": "New"}}, "relationships": {{"OLD": "NEW"}}}}:\n{schema}')
+
+
+def refine_schema_names(schema: dict) -> dict:
+    """asks the llm for label / relationship type renames and applies the valid ones"""
+    labels, relationships = suggest_schema_renames(schema)
+    if not labels and not relationships:
+        return schema
+    return rename_schema(schema, labels, relationships)
+
+
+def suggest_schema_renames(schema: dict) -> tuple[dict, dict]:
+    """({old label: new}, {old type: new}) suggested by the llm, only valid renames of existing names"""
+    summary = {"nodes": schema["nodes"], "edges": schema["edges"]}
+    prompt = load_schema_prompt().format(schema=json.dumps(summary, indent=2))
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1
-        )
-        
-        return response.choices[0].message.content
-    
+        mapping = format_schema_output(chat_completion(prompt, temperature=0.1))
     except Exception as e:
-        print(f"error calling openai: {e}")
-        # Fall back to mock with entities if available
-        if entities:
-            return generate_schema_mock(entities)
-        return '{"nodes": {}, "edges": {}}'
+        print(f"schema name refinement failed, keeping inferred names: {e}")
+        return {}, {}
+
+    labels = {
+        old: new for old, new in (mapping.get("labels") or {}).items()
+        if old in schema["nodes"] and isinstance(new, str) and LABEL_PATTERN.match(new)
+    }
+    relationships = {
+        old: new for old, new in (mapping.get("relationships") or {}).items()
+        if old in schema["edges"] and isinstance(new, str) and RELATIONSHIP_PATTERN.match(new)
+    }
+    return labels, relationships
 
 
 def format_schema_output(raw_llm_response: str) -> dict:
-    """parses llm response into structured schema format"""
+    """parses a json object out of an llm response"""
     try:
         # try to parse as json
         if raw_llm_response.strip().startswith("{"):
             return json.loads(raw_llm_response)
-        
+
         # try to find json in response
         start_idx = raw_llm_response.find("{")
         end_idx = raw_llm_response.rfind("}") + 1
-        
+
         if start_idx != -1 and end_idx != -1:
             json_str = raw_llm_response[start_idx:end_idx]
             return json.loads(json_str)
-        
+
         # fallback
-        return {"nodes": {}, "edges": {}}
-    
+        return {}
+
     except Exception as e:
         print(f"error parsing schema response: {e}")
-        return {"nodes": {}, "edges": {}}
+        return {}
 
 
 def main():
@@ -147,16 +284,16 @@ def main():
     if len(sys.argv) < 2:
         print("usage: python generate_schema.py <entities_file>")
         sys.exit(1)
-    
+
     entities_file = sys.argv[1]
-    
+
     try:
         with open(entities_file, "r") as f:
             entities = json.load(f)
-        
+
         schema = generate_schema_from_entities(entities)
         print(json.dumps(schema, indent=2))
-    
+
     except FileNotFoundError:
         print(f"file not found: {entities_file}")
     except Exception as e:
@@ -164,4 +301,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
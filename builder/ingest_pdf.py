@@ -1,38 +1,105 @@
 import os
+import re
+import sys
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+# add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import PDF_EXTRACT_WORKERS, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, MODEL
+from services.rate_limiter import estimate_tokens
+
+TEXT_READ_SIZE = 1 << 16
+PAGES_PER_TASK = 8
+MAX_CHARS_PER_TOKEN = 16
+RESYNC_EVERY = 8
+
+# whitespace after sentence punctuation (optionally closed by a quote or bracket), or a blank line
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|(?<=[.!?]["\')\]])\s+|\n[ \t]*\n\s*')
+
+# reader opened once per pdf worker process by init_pdf_worker
+_worker_reader = None
+_token_counter = None
 
 
 def load_and_chunk_file(file_path: str) -> list[str]:
     """loads pdf or text file and splits into chunks for llm processing"""
+    return list(iter_file_chunks(file_path))
+
+
+def iter_file_chunks(file_path: str, max_tokens: int = None, overlap_tokens: int = None,
+                     workers: int = None) -> Iterator[str]:
+    """yields chunks of a pdf or text file as the text is read, the file is never held whole"""
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"file not found: {file_path}")
-    
+
     file_extension = Path(file_path).suffix.lower()
-    
+
     if file_extension == '.pdf':
-        text = load_pdf(file_path)
+        pieces = iter_pdf_pages(file_path, workers)
     elif file_extension in ['.txt', '.md']:
-        text = load_text_file(file_path)
+        pieces = iter_text_file(file_path)
     else:
         raise ValueError(f"unsupported file type: {file_extension}")
-    
-    return chunk_text(text)
 
+    return iter_chunks(pieces, max_tokens, overlap_tokens)
 
-def load_pdf(file_path: str) -> str:
-    """extracts text from pdf file"""
+
+def import_pypdf2():
     try:
         import PyPDF2
     except ImportError:
         raise ImportError("pypdf2 required for pdf processing. install with: pip install pypdf2")
-    
-    text = ""
+    return PyPDF2
+
+
+def load_pdf(file_path: str) -> str:
+    """extracts text from pdf file"""
+    return "".join(iter_pdf_pages(file_path)).strip()
+
+
+def iter_pdf_pages(file_path: str, workers: int = None) -> Iterator[str]:
+    """yields the text of each pdf page in order, newline terminated
+
+    with workers > 1 pages are extracted in a process pool, a few tasks ahead of the consumer
+    """
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    PyPDF2 = import_pypdf2()
+
     with open(file_path, 'rb') as file:
         pdf_reader = PyPDF2.PdfReader(file)
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-    
-    return text.strip()
+        if workers <= 1:
+            for page in pdf_reader.pages:
+                yield (page.extract_text() or "") + "\n"
+            return
+        page_count = len(pdf_reader.pages)
+
+    # extraction is cpu bound, so pages go to processes that each open the file once
+    ranges = ((start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_pdf_worker, initargs=(file_path,)) as executor:
+        pending = deque()
+        for start, end in ranges:
+            pending.append(executor.submit(extract_page_range, start, end))
+            # keep a bounded window of tasks so pages are not extracted far ahead of chunking
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def init_pdf_worker(file_path: str) -> None:
+    global _worker_reader
+    PyPDF2 = import_pypdf2()
+    _worker_reader = PyPDF2.PdfReader(file_path)
+
+
+def extract_page_range(start: int, end: int) -> list[str]:
+    """text of pages [start, end) using the reader opened by init_pdf_worker"""
+    return [(_worker_reader.pages[index].extract_text() or "") + "\n" for index in range(start, end)]
 
 
 def load_text_file(file_path: str) -> str:
@@ -41,31 +108,175 @@ def load_text_file(file_path: str) -> str:
         return file.read().strip()
 
 
-def chunk_text(text: str, chunk_size: int = 2000) -> list[str]:
+def iter_text_file(file_path: str, read_size: int = TEXT_READ_SIZE) -> Iterator[str]:
+    """yields a txt or md file in fixed size blocks"""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        while True:
+            block = file.read(read_size)
+            if not block:
+                return
+            yield block
+
+
+def chunk_text(text: str, max_tokens: int = None, overlap_tokens: int = None) -> list[str]:
     """splits text into manageable chunks"""
     if not text:
         return []
-    
-    chunks = []
-    words = text.split()
-    current_chunk = []
-    current_length = 0
-    
-    for word in words:
-        word_length = len(word) + 1  # +1 for space
-        
-        if current_length + word_length > chunk_size and current_chunk:
-            chunks.append(' '.join(current_chunk))
-            current_chunk = [word]
-            current_length = word_length
-        else:
-            current_chunk.append(word)
-            current_length += word_length
-    
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
-    
-    return chunks
+
+    return list(iter_chunks([text], max_tokens, overlap_tokens))
+
+
+def get_token_counter() -> Callable[[str], int]:
+    """token counter for the configured model, tiktoken when installed, otherwise about 4 characters per token"""
+    global _token_counter
+    if _token_counter is None:
+        try:
+            import tiktoken
+            try:
+                encoding = tiktoken.encoding_for_model(MODEL)
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+            _token_counter = lambda text: len(encoding.encode(text, disallowed_special=()))
+        except ImportError:
+            _token_counter = estimate_tokens
+    return _token_counter
+
+
+def iter_segments(pieces: Iterable[str], max_tokens: int, count_tokens: Callable[[str], int]) -> Iterator[tuple]:
+    """yields (text, tokens, ends_paragraph) for each sentence in a stream of text
+
+    sentences are slices of a buffer that only holds the unfinished sentence plus the newest piece;
+    a boundary at the very end of the buffer may continue into the next piece, so it waits
+    """
+    buffer = ""
+    # text with no sentence end is cut at whitespace past this many characters
+    max_pending = max_tokens * MAX_CHARS_PER_TOKEN
+
+    for piece in pieces:
+        buffer += piece
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(buffer):
+            if match.end() == len(buffer):
+                break
+            yield from split_segment(buffer[start:match.start()], is_paragraph_break(match.group()), max_tokens, count_tokens)
+            start = match.end()
+
+        while len(buffer) - start > max_pending:
+            cut = last_whitespace(buffer, start, start + max_pending)
+            yield from split_segment(buffer[start:cut], False, max_tokens, count_tokens)
+            start = cut
+        buffer = buffer[start:]
+
+    yield from split_segment(buffer, True, max_tokens, count_tokens)
+
+
+def is_paragraph_break(separator: str) -> bool:
+    return separator.count("\n") >= 2
+
+
+def last_whitespace(text: str, start: int, end: int) -> int:
+    """position of the last whitespace in text[start:end], or end when there is none"""
+    cut = max(text.rfind(" ", start, end), text.rfind("\n", start, end), text.rfind("\t", start, end))
+    return cut if cut > start else end
+
+
+def split_segment(text: str, ends_paragraph: bool, max_tokens: int, count_tokens: Callable[[str], int]) -> Iterator[tuple]:
+    """yields a sentence as one segment, or at whitespace in pieces of at most max_tokens when it is longer"""
+    text = text.strip()
+    if not text:
+        return
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        yield text, tokens, ends_paragraph
+        return
+
+    start = 0
+    while start < len(text):
+        # aim for max_tokens from the sentence's characters per token, shrink until it fits
+        span = max(1, len(text) * max_tokens // tokens)
+        while True:
+            end = len(text) if start + span >= len(text) else last_whitespace(text, start, start + span)
+            piece = text[start:end].strip()
+            piece_tokens = count_tokens(piece)
+            if piece_tokens <= max_tokens or span == 1:
+                break
+            span = max(1, span * 9 // 10)
+        if piece:
+            yield piece, piece_tokens, ends_paragraph and end >= len(text)
+        start = end
+
+
+def join_segments(segments) -> str:
+    parts = []
+    for text, _, ends_paragraph, _ in segments:
+        parts.append(text)
+        parts.append("\n\n" if ends_paragraph else " ")
+    return "".join(parts[:-1])
+
+
+def iter_chunks(pieces: Iterable[str], max_tokens: int = None, overlap_tokens: int = None) -> Iterator[str]:
+    """packs whole sentences from a stream of text into chunks of at most max_tokens tokens
+
+    a chunk ends at a paragraph break or resync point when that still leaves it at least half full, and the
+    next chunk repeats up to overlap_tokens of trailing sentences so relationships spanning
+    the boundary are seen whole at least once
+    """
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS
+    overlap_tokens = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    count_tokens = get_token_counter()
+
+    # [text, tokens, ends_paragraph, already emitted] for the chunk being built,
+    # tokens including one for the separator the segment is joined with
+    window = deque()
+    total = 0
+
+    for text, tokens, ends_paragraph in iter_segments(pieces, max_tokens - 1, count_tokens):
+        tokens += 1
+        while window and total + tokens > max_tokens:
+            if window[0][3] and (total - sum(segment[1] for segment in window if segment[3])) * 2 < max_tokens:
+                # overlap is dropped rather than emitting a chunk of mostly repeated text
+                total -= window.popleft()[1]
+                continue
+
+            segments = list(window)
+            cut = chunk_cut(segments, max_tokens)
+            yield join_segments(segments[:cut])
+
+            overlap = []
+            overlap_total = 0
+            for segment in reversed(segments[1:cut]):
+                if overlap_total + segment[1] > overlap_tokens:
+                    break
+                overlap_total += segment[1]
+                overlap.append([segment[0], segment[1], segment[2], True])
+            window = deque(reversed(overlap))
+            window.extend(segments[cut:])
+            total = sum(segment[1] for segment in window)
+
+        window.append([text, tokens, ends_paragraph, False])
+        total += tokens
+
+    if any(not segment[3] for segment in window):
+        yield join_segments(window)
+
+
+def chunk_cut(segments: list, max_tokens: int) -> int:
+    """how many leading segments go into the chunk: through the last cut point past half full, else all"""
+    cut = len(segments)
+    running = 0
+    for index, (text, tokens, ends_paragraph, emitted) in enumerate(segments):
+        running += tokens
+        if not emitted and running * 2 >= max_tokens and (ends_paragraph or is_resync_point(text)):
+            cut = index + 1
+    return cut
+
+
+def is_resync_point(sentence: str) -> bool:
+    """content defined cut points: chunk boundaries after an edit fall back into step with the
+    previous build within a chunk or two, which keeps incremental rebuilds small
+    """
+    return zlib.crc32(sentence.encode("utf-8")) % RESYNC_EVERY == 0
 
 
 def main():
@@ -74,17 +285,17 @@ def main():
     if len(sys.argv) != 2:
         print("usage: python ingest_pdf.py <file_path>")
         return
-    
+
     file_path = sys.argv[1]
     try:
         chunks = load_and_chunk_file(file_path)
         print(f"loaded {len(chunks)} chunks from {file_path}")
         for i, chunk in enumerate(chunks[:3]):  # show first 3 chunks
-            print(f"\nchunk {i+1} ({len(chunk)} chars):")
+            print(f"\nchunk {i+1} ({len(chunk)} chars, {get_token_counter()(chunk)} tokens):")
             print(chunk[:200] + "..." if len(chunk) > 200 else chunk)
     except Exception as e:
         print(f"error: {e}")
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -8,13 +8,89 @@ NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7689")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "your_password")
 
+# neo4j connection pool
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60"))
+NEO4J_LIVENESS_CHECK_TIMEOUT = float(os.getenv("NEO4J_LIVENESS_CHECK_TIMEOUT", "30"))
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+
+# streaming results: records pulled per round trip, rows shown for a question
+NEO4J_FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))
+QUERY_PREVIEW_ROWS = int(os.getenv("QUERY_PREVIEW_ROWS", "10"))
+QUERY_PREVIEW_LIMIT_REWRITE = os.getenv("QUERY_PREVIEW_LIMIT_REWRITE", "true").lower() == "true"
+TABLE_MAX_COLUMN_WIDTH = int(os.getenv("TABLE_MAX_COLUMN_WIDTH", "40"))
+
+# batched cypher ingestion
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "3"))
+INGEST_RETRY_BACKOFF = float(os.getenv("INGEST_RETRY_BACKOFF", "0.5"))
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "sk-...")
 MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
 TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.3"))
 
+# llm concurrency and rate limits (0 disables a limit)
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "4"))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+
+# pdf page extraction processes for the build pipeline (0 or 1 extracts in-process)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0"))
+
+# build pipeline chunk size and the trailing sentences repeated in the next chunk, in tokens
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "800"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "80"))
+
+# batch builds: threads per stage, queue bound between stages, merged items per cypher batch
+BATCH_READ_WORKERS = int(os.getenv("BATCH_READ_WORKERS", "2"))
+BATCH_EXTRACT_WORKERS = int(os.getenv("BATCH_EXTRACT_WORKERS", str(LLM_MAX_WORKERS)))
+BATCH_WRITE_WORKERS = int(os.getenv("BATCH_WRITE_WORKERS", "1"))
+BATCH_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", "64"))
+BATCH_MERGE_ITEMS = int(os.getenv("BATCH_MERGE_ITEMS", "50"))
+
+# on-disk llm response cache (ttl in seconds, 0 disables expiry / size bound)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "llm_cache.sqlite3")
+)
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+# near-duplicate question -> cypher cache for the query agent
+QUESTION_CACHE_ENABLED = os.getenv("QUESTION_CACHE_ENABLED", "true").lower() == "true"
+QUESTION_CACHE_PATH = os.getenv(
+    "QUESTION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "question_cache.json")
+)
+QUESTION_CACHE_MAX_ENTRIES = int(os.getenv("QUESTION_CACHE_MAX_ENTRIES", "500"))
+QUESTION_CACHE_THRESHOLD = float(os.getenv("QUESTION_CACHE_THRESHOLD", "0.85"))
+
+# seconds between schema fingerprint checks when building prompts
+SCHEMA_SNAPSHOT_CHECK_INTERVAL = float(os.getenv("SCHEMA_SNAPSHOT_CHECK_INTERVAL", "30"))
+# the last schema snapshot on disk, so one-shot cli runs skip discovery while the schema is unchanged
+SCHEMA_SNAPSHOT_PATH = os.getenv(
+    "SCHEMA_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "schema_snapshot.json")
+)
+
+# schema discovery: property keys come from a bounded per-label sample ("sample")
+# or from db.schema.nodeTypeProperties() ("procedure")
+SCHEMA_PROPERTY_DISCOVERY = os.getenv("SCHEMA_PROPERTY_DISCOVERY", "sample").lower()
+SCHEMA_SAMPLE_SIZE = int(os.getenv("SCHEMA_SAMPLE_SIZE", "100"))
+SCHEMA_SAMPLES_PER_LABEL = int(os.getenv("SCHEMA_SAMPLES_PER_LABEL", "3"))
+
+# build pipeline schemas are inferred locally; refinement lets the llm rename labels and types
+SCHEMA_NAME_REFINEMENT = os.getenv("SCHEMA_NAME_REFINEMENT", "false").lower() == "true"
+
+# how the nypd graph models victims and suspects: "node" (one per row), "profile"
+# (shared demographic nodes) or "property" (demographics on Incident) - must match the loader
+NYPD_VICTIM_MODEL = os.getenv("NYPD_VICTIM_MODEL", "node").lower()
+NYPD_SUSPECT_MODEL = os.getenv("NYPD_SUSPECT_MODEL", "node").lower()
+
 # mock toggles for development
 USE_MOCK_LLM = os.getenv("USE_MOCK_LLM", "true").lower() == "true"
 USE_MOCK_NEO4J = os.getenv("USE_MOCK_NEO4J", "true").lower() == "true"
 
 # logging and debugging
-VERBOSE = os.getenv("VERBOSE", "false").lower() == "true" 
\ No newline at end of file
+VERBOSE = os.getenv("VERBOSE", "false").lower() == "true"
@@ -1,6 +1,40 @@
 // sample cypher schema for nypd crime data
 // based on schema design - 5 node types with 6 relationships
 
+// constraints and indexes on the keys the loaders match on
+// the loaders run every CREATE CONSTRAINT / CREATE INDEX statement below before writing data
+CREATE CONSTRAINT incident_cmplnt_num IF NOT EXISTS
+FOR (i:Incident) REQUIRE i.cmplntNum IS UNIQUE;
+
+CREATE CONSTRAINT location_borough_precinct IF NOT EXISTS
+FOR (l:Location) REQUIRE (l.borough, l.precinct) IS UNIQUE;
+
+CREATE CONSTRAINT offense_description IF NOT EXISTS
+FOR (o:Offense) REQUIRE o.offenseDescription IS UNIQUE;
+
+CREATE INDEX victim_vic_id IF NOT EXISTS
+FOR (v:Victim) ON (v.vicId);
+
+CREATE INDEX suspect_susp_id IF NOT EXISTS
+FOR (s:Suspect) ON (s.suspId);
+
+// shared demographic profile nodes (NYPD_VICTIM_MODEL / NYPD_SUSPECT_MODEL = profile)
+CREATE INDEX victim_profile IF NOT EXISTS
+FOR (v:Victim) ON (v.vicAgeGroup, v.vicRace, v.vicSex);
+
+CREATE INDEX suspect_profile IF NOT EXISTS
+FOR (s:Suspect) ON (s.suspAgeGroup, s.suspRace, s.suspSex);
+
+// demographics stored on the incident (model = property) and the common incident filter
+CREATE INDEX incident_vic_age_group IF NOT EXISTS
+FOR (i:Incident) ON (i.vicAgeGroup);
+
+CREATE INDEX incident_susp_age_group IF NOT EXISTS
+FOR (i:Incident) ON (i.suspAgeGroup);
+
+CREATE INDEX incident_law_category IF NOT EXISTS
+FOR (i:Incident) ON (i.lawCategory);
+
 // create nodes and relationships in single transaction
 CREATE (i1:Incident {
   cmplntNum: 298725583,
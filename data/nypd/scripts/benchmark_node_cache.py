@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from nypd_loader import NodeCache
+
+BOROUGHS = ['BRONX', 'BROOKLYN', 'MANHATTAN', 'QUEENS', 'STATEN ISLAND']
+AGE_GROUPS = ['<18', '18-24', '25-44', '45-64', '65+', 'UNKNOWN']
+RACES = ['BLACK', 'WHITE', 'WHITE HISPANIC', 'BLACK HISPANIC', 'ASIAN / PACIFIC ISLANDER', 'UNKNOWN']
+SEXES = ['M', 'F', 'E', 'D']
+
+class DictNodeCache:
+    """the previous cache: one dict per entity keyed by a formatted string, kept for comparison"""
+
+    def __init__(self):
+        self.locations = {}
+        self.victims = {}
+
+    def add_location(self, borough, precinct, lonlat):
+        key = f"{borough}_{precinct}"
+        if key in self.locations:
+            return key, False
+        self.locations[key] = {'borough': borough, 'precinct': precinct, 'lonLat': lonlat}
+        return key, True
+
+    def add_victim(self, vic_id, age_group, race, sex):
+        key = vic_id
+        if key in self.victims:
+            return key, False
+        self.victims[key] = {'vicId': vic_id, 'vicAgeGroup': age_group, 'vicRace': race, 'vicSex': sex}
+        return key, True
+
+def generate_rows(count, seed = 7):
+    """json encoded rows shaped like the flattened dataset, built before measuring"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        precinct = rng.randint(1, 123)
+        rows.append((
+            BOROUGHS[precinct % len(BOROUGHS)], precinct, f"POINT ({40 + precinct / 1000:.4f}, -73.9)",
+            f"V{i:09d}", rng.choice(AGE_GROUPS), rng.choice(RACES), rng.choice(SEXES)
+        ))
+    return [json.dumps(row) for row in rows]
+
+def measure(cache_class, rows):
+    """(bytes allocated by the cache, seconds) for adding every row
+
+    rows are decoded inside the measurement, so strings count against a cache only if it keeps them
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+
+    cache = cache_class()
+    for row in rows:
+        borough, precinct, lonlat, vic_id, age_group, race, sex = json.loads(row)
+        cache.add_location(borough, precinct, lonlat)
+        cache.add_victim(vic_id, age_group, race, sex)
+
+    elapsed = time.perf_counter() - start
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used, elapsed, cache
+
+def main():
+    parser = argparse.ArgumentParser(description = "compare NodeCache memory against the dict-per-entity cache")
+    parser.add_argument("--rows", type = int, default = 500000, help = "synthetic victims to cache")
+    args = parser.parse_args()
+
+    print("=== NodeCache Benchmark ===\n")
+    rows = generate_rows(args.rows)
+
+    results = {}
+    for name, cache_class in [("dict per entity", DictNodeCache), ("interned tables", NodeCache)]:
+        used, elapsed, cache = measure(cache_class, rows)
+        entities = len(cache.locations) + len(cache.victims)
+        results[name] = used / entities
+        print(f"{name:16} {entities} entities  {used / 1e6:8.1f} mb  {used / entities:6.0f} bytes/entity  {elapsed:.2f}s")
+        del cache
+
+    ratio = results["dict per entity"] / results["interned tables"]
+    print(f"\nmemory per entity is {ratio:.1f}x smaller")
+
+if __name__ == "__main__":
+    main()
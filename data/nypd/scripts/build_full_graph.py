@@ -1,16 +1,19 @@
 #!/usr/bin/env python3
 
-import json
+import argparse
 import sys
 import os
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
+from nypd_stream import default_flattened_path, iter_records, report_peak_rss
+from nypd_loader import DEFAULT_BATCH_SIZE, DEFAULT_CHECKPOINT, LOADER_COLUMNS, PERSON_MODELS, default_person_models, clear_checkpoint, clear_graph, ensure_schema, load_dataset, read_checkpoint
 
 load_dotenv()
 
-def load_nypd_data(file_path = "data/nypd/data/flattened_nypd_data.json"):
-    with open(file_path, 'r', encoding = 'utf-8') as f:
-        return json.load(f)
+DEFAULT_DATA_FILE = default_flattened_path()
+
+def load_nypd_data(file_path = DEFAULT_DATA_FILE):
+    return iter_records(file_path, columns = LOADER_COLUMNS)
 
 def connect_to_neo4j():
     uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
@@ -25,193 +28,6 @@ def connect_to_neo4j():
         print(f"connection failed: {e}")
         return None
 
-def clear_existing_data(driver):
-    print("clearing existing data...")
-    with driver.session() as session:
-        result = session.run("MATCH (n) DETACH DELETE n")
-        summary = result.consume()
-        print("database cleared")
-
-def create_incident_nodes(driver, data, limit = 50):
-    print(f"creating {limit} incident nodes...")
-    
-    create_query = """
-    UNWIND $incidents AS incident
-    CREATE (i:Incident {
-        cmplntNum: incident.cmplntNum,
-        cmplntStartDate: incident.cmplntStartDate,
-        cmplntEndDate: incident.cmplntEndDate,
-        cmplntStartTime: incident.cmplntStartTime,
-        cmplntEndTime: incident.cmplntEndTime,
-        crimeStatus: incident.crimeStatus,
-        lawCategory: incident.lawCategory,
-        spatialContext: incident.spatialContext
-    })
-    """
-    
-    incidents_batch = data[:limit]
-    
-    with driver.session() as session:
-        result = session.run(create_query, incidents = incidents_batch)
-        summary = result.consume()
-        print(f"created {summary.counters.nodes_created} incident nodes")
-
-def create_location_nodes(driver, data, limit = 50):
-    print("creating location nodes...")
-    
-    # collect unique locations from the data
-    locations = {}
-    for record in data[:limit]:
-        if record.get('borough') and record.get('precinct'):
-            key = f"{record['borough']}_{record['precinct']}"
-            if key not in locations:
-                locations[key] = {
-                    'borough': record['borough'],
-                    'precinct': record['precinct'],
-                    'lonLat': record.get('lonLat', 'UNKNOWN')
-                }
-    
-    create_query = """
-    UNWIND $locations AS location
-    CREATE (l:Location {
-        borough: location.borough,
-        precinct: location.precinct,
-        lonLat: location.lonLat
-    })
-    """
-    
-    with driver.session() as session:
-        result = session.run(create_query, locations = list(locations.values()))
-        summary = result.consume()
-        print(f"created {summary.counters.nodes_created} location nodes")
-
-def create_offense_nodes(driver, data, limit = 50):
-    print("creating offense nodes...")
-    
-    # collect unique offenses
-    offenses = {}
-    for record in data[:limit]:
-        if record.get('offenseDescription'):
-            key = record['offenseDescription']
-            if key not in offenses:
-                offenses[key] = {
-                    'offenseDescription': record['offenseDescription'],
-                    'offenseCode': record.get('offenseCode', 0),
-                    'nypdCode': record.get('nypdCode', 'UNKNOWN')
-                }
-    
-    create_query = """
-    UNWIND $offenses AS offense
-    CREATE (o:Offense {
-        offenseDescription: offense.offenseDescription,
-        offenseCode: offense.offenseCode,
-        nypdCode: offense.nypdCode
-    })
-    """
-    
-    with driver.session() as session:
-        result = session.run(create_query, offenses = list(offenses.values()))
-        summary = result.consume()
-        print(f"created {summary.counters.nodes_created} offense nodes")
-
-def create_victim_nodes(driver, data, limit = 50):
-    print("creating victim nodes...")
-    
-    create_query = """
-    UNWIND $victims AS victim
-    CREATE (v:Victim {
-        vicId: victim.vicId,
-        vicAgeGroup: victim.vicAgeGroup,
-        vicRace: victim.vicRace,
-        vicSex: victim.vicSex
-    })
-    """
-    
-    victims_batch = data[:limit]
-    
-    with driver.session() as session:
-        result = session.run(create_query, victims = victims_batch)
-        summary = result.consume()
-        print(f"created {summary.counters.nodes_created} victim nodes")
-
-def create_suspect_nodes(driver, data, limit = 50):
-    print("creating suspect nodes...")
-    
-    create_query = """
-    UNWIND $suspects AS suspect
-    CREATE (s:Suspect {
-        suspId: suspect.suspId,
-        suspAgeGroup: suspect.suspAgeGroup,
-        suspRace: suspect.suspRace,
-        suspSex: suspect.suspSex
-    })
-    """
-    
-    suspects_batch = data[:limit]
-    
-    with driver.session() as session:
-        result = session.run(create_query, suspects = suspects_batch)
-        summary = result.consume()
-        print(f"created {summary.counters.nodes_created} suspect nodes")
-
-def create_relationships(driver, data, limit = 50):
-    print("creating relationships...")
-    
-    # occurred_in relationships
-    occurred_query = """
-    UNWIND $incidents AS incident
-    MATCH (i:Incident {cmplntNum: incident.cmplntNum})
-    MATCH (l:Location {borough: incident.borough, precinct: incident.precinct})
-    CREATE (i)-[:OCCURRED_IN]->(l)
-    """
-    
-    # classified_as relationships  
-    classified_query = """
-    UNWIND $incidents AS incident
-    MATCH (i:Incident {cmplntNum: incident.cmplntNum})
-    MATCH (o:Offense {offenseDescription: incident.offenseDescription})
-    CREATE (i)-[:CLASSIFIED_AS]->(o)
-    """
-    
-    # involves_victim relationships
-    victim_query = """
-    UNWIND $incidents AS incident
-    MATCH (i:Incident {cmplntNum: incident.cmplntNum})
-    MATCH (v:Victim {vicId: incident.vicId})
-    CREATE (i)-[:INVOLVES_VICTIM]->(v)
-    """
-    
-    # involves_suspect relationships
-    suspect_query = """
-    UNWIND $incidents AS incident
-    MATCH (i:Incident {cmplntNum: incident.cmplntNum})
-    MATCH (s:Suspect {suspId: incident.suspId})
-    CREATE (i)-[:INVOLVES_SUSPECT]->(s)
-    """
-    
-    incidents_batch = data[:limit]
-    
-    with driver.session() as session:
-        # create all relationship types
-        result1 = session.run(occurred_query, incidents = incidents_batch)
-        occurred_count = result1.consume().counters.relationships_created
-        
-        result2 = session.run(classified_query, incidents = incidents_batch) 
-        classified_count = result2.consume().counters.relationships_created
-        
-        result3 = session.run(victim_query, incidents = incidents_batch)
-        victim_count = result3.consume().counters.relationships_created
-        
-        result4 = session.run(suspect_query, incidents = incidents_batch)
-        suspect_count = result4.consume().counters.relationships_created
-        
-        total_relationships = occurred_count + classified_count + victim_count + suspect_count
-        print(f"created {total_relationships} relationships")
-        print(f"  - occurred_in: {occurred_count}")
-        print(f"  - classified_as: {classified_count}")  
-        print(f"  - involves_victim: {victim_count}")
-        print(f"  - involves_suspect: {suspect_count}")
-
 def verify_graph(driver):
     print("\nverifying graph structure:")
     
@@ -230,11 +46,24 @@ def verify_graph(driver):
             count = result.single()["count"]
             print(f"  {name}: {count}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description = "load the full nypd dataset into neo4j")
+    parser.add_argument("--file", default = DEFAULT_DATA_FILE, help = "flattened dataset (json array or json lines)")
+    parser.add_argument("--batch-size", type = int, default = DEFAULT_BATCH_SIZE, help = "rows per transaction")
+    parser.add_argument("--limit", type = int, default = None, help = "stop after this many rows")
+    parser.add_argument("--checkpoint", default = DEFAULT_CHECKPOINT, help = "progress file used to resume")
+    parser.add_argument("--fresh", action = "store_true", help = "ignore the checkpoint and clear the graph first")
+    parser.add_argument("--incremental", action = "store_true",
+                        help = "upsert changed records into the existing graph instead of rebuilding it")
+    parser.add_argument("--victim-model", choices = PERSON_MODELS, default = None,
+                        help = "victim nodes per row, shared profiles or incident properties (default NYPD_VICTIM_MODEL)")
+    parser.add_argument("--suspect-model", choices = PERSON_MODELS, default = None,
+                        help = "suspect nodes per row, shared profiles or incident properties (default NYPD_SUSPECT_MODEL)")
+    return parser.parse_args()
+
 def main():
     print("=== NYPD Full Graph Builder ===\n")
-    
-    data = load_nypd_data()
-    print(f"loaded {len(data)} records")
+    args = parse_args()
     
     driver = connect_to_neo4j()
     if not driver:
@@ -242,20 +71,33 @@ def main():
         sys.exit(1)
     
     try:
-        clear_existing_data(driver)
-        create_incident_nodes(driver, data, limit = 50)
-        create_location_nodes(driver, data, limit = 50)
-        create_offense_nodes(driver, data, limit = 50)
-        create_victim_nodes(driver, data, limit = 50)
-        create_suspect_nodes(driver, data, limit = 50)
-        create_relationships(driver, data, limit = 50)
+        if args.fresh:
+            clear_checkpoint(args.checkpoint)
+        
+        # only start from an empty graph when there is nothing to resume
+        if not args.incremental and not read_checkpoint(args.checkpoint, args.file):
+            clear_graph(driver, args.batch_size)
+        
+        ensure_schema(driver)
+        
+        models = default_person_models()
+        models['victim'] = args.victim_model or models['victim']
+        models['suspect'] = args.suspect_model or models['suspect']
+        
+        load_dataset(
+            driver, load_nypd_data(args.file), args.file,
+            batch_size = args.batch_size, checkpoint_path = args.checkpoint, limit = args.limit,
+            incremental = args.incremental, models = models
+        )
         verify_graph(driver)
         print("\nsuccess: full graph created with relationships")
         
     except Exception as e:
         print(f"error creating graph: {e}")
+        print(f"rerun to resume from {args.checkpoint}")
     finally:
         driver.close()
+        report_peak_rss()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -5,12 +5,14 @@ import sys
 import os
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
+from itertools import islice
+from nypd_stream import default_flattened_path, iter_records, report_peak_rss
 
 load_dotenv()
 
-def load_nypd_data(file_path = "data/nypd/data/flattened_nypd_data.json"):
-    with open(file_path, 'r', encoding = 'utf-8') as f:
-        return json.load(f)
+def load_nypd_data(file_path = None, limit = 50):
+    # stream the file and keep only the rows this loader uses
+    return list(islice(iter_records(file_path or default_flattened_path()), limit))
 
 def connect_to_neo4j():
     uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
@@ -82,6 +84,7 @@ def main():
         print(f"error creating nodes: {e}")
     finally:
         driver.close()
+        report_peak_rss()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import gzip
+import json
+import os
+from nypd_stream import default_flattened_path, iter_records, report_peak_rss
+from nypd_loader import DEFAULT_BATCH_SIZE, LOADER_COLUMNS, NodeCache, iter_batches, prepare_batch, record_hash
+
+DEFAULT_DATA_FILE = default_flattened_path()
+DEFAULT_OUTPUT_DIR = "data/nypd/data/import"
+
+# (file stem, label, properties) - ids live in their own :ID column so property types stay as loaded
+# incidents are identified by complaint number, the shared node types by their NodeCache node id
+NODE_FILES = [
+    ("incidents", "Incident", [
+        "cmplntNum", "contentHash", "cmplntStartDate", "cmplntEndDate", "cmplntStartTime",
+        "cmplntEndTime", "crimeStatus", "lawCategory", "spatialContext"
+    ]),
+    ("locations", "Location", ["borough", "precinct", "lonLat"]),
+    ("offenses", "Offense", ["offenseDescription", "offenseCode", "nypdCode"]),
+    ("victims", "Victim", ["vicId", "vicAgeGroup", "vicRace", "vicSex"]),
+    ("suspects", "Suspect", ["suspId", "suspAgeGroup", "suspRace", "suspSex"]),
+]
+
+# (file stem, relationship type, start label, end label)
+RELATIONSHIP_FILES = [
+    ("occurred_in", "OCCURRED_IN", "Incident", "Location"),
+    ("classified_as", "CLASSIFIED_AS", "Incident", "Offense"),
+    ("involves_victim", "INVOLVES_VICTIM", "Incident", "Victim"),
+    ("involves_suspect", "INVOLVES_SUSPECT", "Incident", "Suspect"),
+]
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+def value_type(value):
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        return 'long'
+    if isinstance(value, float):
+        return 'double'
+    return 'string'
+
+class ImportFile:
+    """one header file plus one data file in the neo4j-admin import format
+
+    the header is written on close, once the type of every property column is known
+    """
+
+    def __init__(self, directory, stem, id_columns, properties = (), compress = False):
+        self.directory = directory
+        self.stem = stem
+        self.id_columns = list(id_columns)
+        self.properties = list(properties)
+        self.types = {name: None for name in self.properties}
+        self.rows = 0
+
+        self.data_path = os.path.join(directory, f"{stem}.csv" + (".gz" if compress else ""))
+        self.header_path = os.path.join(directory, f"{stem}_header.csv")
+
+        if compress:
+            self.file = gzip.open(self.data_path, 'wt', encoding = 'utf-8', newline = '')
+        else:
+            self.file = open(self.data_path, 'w', encoding = 'utf-8', newline = '')
+        self.writer = csv.writer(self.file)
+
+    def write(self, ids, record = None):
+        row = [str(value) for value in ids]
+        for name in self.properties:
+            value = record.get(name) if record else None
+            if value is not None:
+                kind = value_type(value)
+                seen = self.types[name]
+                if seen is None:
+                    self.types[name] = kind
+                elif seen != kind:
+                    # mixed numbers widen to double, anything else falls back to string
+                    self.types[name] = 'double' if {seen, kind} == {'long', 'double'} else 'string'
+            row.append(csv_value(value))
+        self.writer.writerow(row)
+        self.rows += 1
+
+    def header(self):
+        columns = list(self.id_columns)
+        for name in self.properties:
+            kind = self.types[name]
+            columns.append(name if kind in (None, 'string') else f"{name}:{kind}")
+        return columns
+
+    def close(self):
+        self.file.close()
+        with open(self.header_path, 'w', encoding = 'utf-8', newline = '') as f:
+            csv.writer(f).writerow(self.header())
+
+    def import_argument(self, name):
+        return f"{name}={self.header_path},{self.data_path}"
+
+def open_import_files(output_dir, compress = False):
+    os.makedirs(output_dir, exist_ok = True)
+
+    nodes = {
+        stem: ImportFile(output_dir, stem, [f":ID({label})"], properties, compress)
+        for stem, label, properties in NODE_FILES
+    }
+    relationships = {
+        stem: ImportFile(output_dir, stem, [f":START_ID({start})", f":END_ID({end})"], compress = compress)
+        for stem, _, start, end in RELATIONSHIP_FILES
+    }
+    return nodes, relationships
+
+def export_records(records, output_dir = DEFAULT_OUTPUT_DIR, compress = False, batch_size = DEFAULT_BATCH_SIZE):
+    """streams flattened records into node and relationship csv files, returns the closed files
+
+    locations and offenses are deduplicated by the loader's batch preparation and victims and
+    suspects by the same NodeCache; a repeated complaint number is exported once
+    """
+    cache = NodeCache()
+    seen_incidents = set()
+    nodes, relationships = open_import_files(output_dir, compress)
+
+    try:
+        for batch in iter_batches(records, batch_size):
+            fresh = []
+            for record in batch:
+                key = record.get('cmplntNum')
+                if not key or key in seen_incidents:
+                    continue
+                seen_incidents.add(key)
+                record['contentHash'] = record_hash(record)
+                fresh.append(record)
+            # the csv layout has one node per victim and suspect, whatever the loader models are
+            prepared = prepare_batch(fresh, cache, models = {'victim': 'node', 'suspect': 'node'})
+
+            for record in prepared['incidents']:
+                nodes['incidents'].write([record['cmplntNum']], record)
+
+            for location in prepared['locations']:
+                node_id = cache.locations.node_id(location['borough'], location['precinct'])
+                nodes['locations'].write([node_id], location)
+            for offense in prepared['offenses']:
+                nodes['offenses'].write([cache.offenses.node_id(offense['offenseDescription'])], offense)
+
+            for record in prepared['victims']:
+                node_id, is_new = cache.add_victim(record['vicId'], record.get('vicAgeGroup'), record.get('vicRace'), record.get('vicSex'))
+                if is_new:
+                    nodes['victims'].write([node_id], record)
+            for record in prepared['suspects']:
+                node_id, is_new = cache.add_suspect(record['suspId'], record.get('suspAgeGroup'), record.get('suspRace'), record.get('suspSex'))
+                if is_new:
+                    nodes['suspects'].write([node_id], record)
+
+            for record in prepared['occurred_in']:
+                end_id = cache.locations.node_id(record['borough'], record['precinct'])
+                relationships['occurred_in'].write([record['cmplntNum'], end_id])
+            for record in prepared['classified_as']:
+                end_id = cache.offenses.node_id(record['offenseDescription'])
+                relationships['classified_as'].write([record['cmplntNum'], end_id])
+            for record in prepared['involves_victim']:
+                relationships['involves_victim'].write([record['cmplntNum'], cache.victims.node_id(record['vicId'])])
+            for record in prepared['involves_suspect']:
+                relationships['involves_suspect'].write([record['cmplntNum'], cache.suspects.node_id(record['suspId'])])
+    finally:
+        for import_file in list(nodes.values()) + list(relationships.values()):
+            import_file.close()
+
+    return nodes, relationships
+
+def import_command(nodes, relationships, database = "neo4j"):
+    """the neo4j-admin invocation that loads the exported files into an empty database"""
+    parts = ["neo4j-admin database import full"]
+    for stem, label, _ in NODE_FILES:
+        parts.append(f"--nodes={nodes[stem].import_argument(label)}")
+    for stem, rel_type, _, _ in RELATIONSHIP_FILES:
+        parts.append(f"--relationships={relationships[stem].import_argument(rel_type)}")
+    parts.append(database)
+    return " \\\n  ".join(parts)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description = "export the nypd dataset as neo4j-admin bulk import csv files")
+    parser.add_argument("--file", default = DEFAULT_DATA_FILE, help = "flattened dataset (json array or json lines)")
+    parser.add_argument("--output-dir", default = DEFAULT_OUTPUT_DIR, help = "directory for header and data files")
+    parser.add_argument("--gzip", action = "store_true", help = "gzip the data files")
+    parser.add_argument("--batch-size", type = int, default = DEFAULT_BATCH_SIZE, help = "records prepared at a time")
+    parser.add_argument("--database", default = "neo4j", help = "target database in the printed import command")
+    return parser.parse_args()
+
+def main():
+    print("=== NYPD Bulk Import Export ===\n")
+    args = parse_args()
+
+    nodes, relationships = export_records(
+        iter_records(args.file, columns = LOADER_COLUMNS), args.output_dir, compress = args.gzip, batch_size = args.batch_size
+    )
+
+    print("nodes:")
+    for stem, label, _ in NODE_FILES:
+        print(f"  - {label}: {nodes[stem].rows}")
+    print("relationships:")
+    for stem, rel_type, _, _ in RELATIONSHIP_FILES:
+        print(f"  - {rel_type}: {relationships[stem].rows}")
+
+    print(f"\nwritten to: {args.output_dir}")
+    print("\nload into a stopped, empty database with:\n")
+    print(import_command(nodes, relationships, args.database))
+    report_peak_rss()
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,39 @@
 #!/usr/bin/env python3
 
+import argparse
 import json
+import multiprocessing
 import os
+import time
+from collections import deque
+from itertools import islice
+from nypd_stream import FLATTENED_JSON, FLATTENED_JSONL, detect_format, iter_json_array_text, iter_records, report_peak_rss
 
-def load_data(file_path="data/nypd/data/2025_nypd.json"):
+RAW_DATA_FILE = "data/nypd/data/2025_nypd.json"
+CHUNK_RECORDS = 2000
+
+def load_data(file_path=RAW_DATA_FILE):
+    return iter_records(file_path)
+
+def iter_chunks(file_path, chunk_records=CHUNK_RECORDS):
+    """yields lists of raw json text, one document per record, for json lines or a json array
+
+    the parent only finds where each record starts and ends, decoding is left to the worker processes
+    """
     with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+        file_format = detect_format(f)
+        if file_format == 'lines':
+            items = (line for line in f if line.strip())
+        elif file_format == 'array':
+            items = iter_json_array_text(f)
+        else:
+            return
+        
+        while True:
+            chunk = list(islice(items, chunk_records))
+            if not chunk:
+                return
+            yield chunk
 
 def flatten(record):
     result = {}
@@ -27,20 +55,81 @@ def flatten(record):
     return result
 
 def process_data(data):
-    return [flatten(record) for record in data]
+    return (flatten(record) for record in data)
+
+def flatten_chunk(items):
+    """worker side: decode, flatten and serialize one chunk of raw json documents"""
+    out = []
+    for item in items:
+        out.append(json.dumps(flatten(json.loads(item)), separators=(',', ':')))
+    return out
+
+def ordered_map(pool, func, chunks, window):
+    """like pool.imap, but never has more than window chunks in flight so input is read lazily"""
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.apply_async(func, (chunk,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def flatten_file(input_file, output_file, workers=None, output_format='jsonl', chunk_records=CHUNK_RECORDS):
+    """flattens input_file into output_file across a process pool, keeping record order
+
+    returns the number of records written
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = iter_chunks(input_file, chunk_records)
+    separator = '\n' if output_format == 'jsonl' else ',\n'
+    count = 0
+    
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    
+    with open(output_file, 'w', encoding='utf-8') as f:
+        if output_format == 'json':
+            f.write('[\n')
+        
+        def write(documents):
+            nonlocal count
+            if not documents:
+                return
+            if count:
+                f.write(separator)
+            f.write(separator.join(documents))
+            count += len(documents)
+        
+        if workers == 1:
+            for chunk in chunks:
+                write(flatten_chunk(chunk))
+        else:
+            with multiprocessing.Pool(workers) as pool:
+                for documents in ordered_map(pool, flatten_chunk, chunks, window=workers * 2):
+                    write(documents)
+        
+        f.write('\n' if output_format == 'jsonl' else '\n]\n')
+    
+    return count
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="flatten the nypd dataset in parallel")
+    parser.add_argument("--input", default=RAW_DATA_FILE, help="raw dataset (json array or json lines)")
+    parser.add_argument("--output", default=None, help="output file, defaults to the flattened dataset path for the format")
+    parser.add_argument("--format", choices=["jsonl", "json"], default="jsonl", help="json lines or a compact json array")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="flattening processes")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_RECORDS, help="records per work item")
+    return parser.parse_args()
 
 def main():
     print("=== Flattening NYPD Dataset ===\n")
+    args = parse_args()
     
-    data = load_data()
-    print(f"Original: {len(data)} records")
-    
-    flattened = process_data(data)
-    print(f"Flattened: {len(flattened)} records")
+    orig = next(load_data(args.input), None)
     
-    if data and flattened:
-        orig = data[0]
-        flat = flattened[0]
+    if orig is not None:
+        flat = flatten(orig)
         
         print(f"\nOriginal keys: {len(orig.keys())}")
         print(f"Flattened keys: {len(flat.keys())}")
@@ -57,11 +146,16 @@ def main():
             
             print(f"  {key:25} ({vtype:10}) = {sample}")
     
-    output_file = "data/nypd/data/flattened_nypd_data.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(flattened, f, indent=2)
+    output_file = args.output or (FLATTENED_JSONL if args.format == 'jsonl' else FLATTENED_JSON)
+    
+    start = time.perf_counter()
+    count = flatten_file(args.input, output_file, args.workers, args.format, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else float(count)
     
-    print(f"\nSaved to: {output_file}")
+    print(f"\nFlattened: {count} records with {args.workers} workers in {elapsed:.1f}s ({rate:.0f} records/sec)")
+    print(f"Saved to: {output_file}")
+    report_peak_rss()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
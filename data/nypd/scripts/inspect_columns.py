@@ -1,55 +1,147 @@
 #!/usr/bin/env python3
 
+import argparse
+import hashlib
 import json
+import math
+import time
 from collections import defaultdict, Counter
+from itertools import islice
+from nypd_stream import iter_records, report_peak_rss
+
+# columns keep exact value counts until this many distinct values, then switch to hyperloglog
+EXACT_DISTINCT_LIMIT = 1000
+HLL_PRECISION = 12
+SAMPLE_COUNT = 5
+# rows pivoted into per-column lists before the counters run over them
+CHUNK_ROWS = 50000
 
 def load_data(file_path="data/nypd/data/2025_nypd.json"):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return iter_records(file_path)
 
-def analyze_columns(data, sample_size=10000):
-    print(f"Analyzing {len(data)} records (sampling {min(sample_size, len(data))})")
-    
-    sample_data = data[:sample_size] if len(data) > sample_size else data
-    
-    info = {}
-    
-    keys = set()
-    for record in sample_data:
-        keys.update(record.keys())
-    
-    for key in sorted(keys):
-        values = []
-        types = []
+def hashable(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return value
+
+class HyperLogLog:
+    """approximate distinct counter, about 1.6% standard error at precision 12"""
+    
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        self.alpha = 0.7213 / (1 + 1.079 / self.size)
+    
+    def update(self, values):
+        registers = self.registers
+        shift = 64 - self.precision
+        low_mask = (1 << shift) - 1
+        for value in values:
+            # a stable digest, builtin hash() of str is randomized per process
+            digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+            x = int.from_bytes(digest, 'big')
+            index = x >> shift
+            rank = shift - (x & low_mask).bit_length() + 1
+            if rank > registers[index]:
+                registers[index] = rank
+    
+    def count(self):
+        estimate = self.alpha * self.size * self.size / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # linear counting is more accurate while many registers are still empty
+        if estimate <= 2.5 * self.size and zeros:
+            return round(self.size * math.log(self.size / zeros))
+        return round(estimate)
+
+class ColumnProfile:
+    """accumulator for one column, fed a chunk of non-null values at a time"""
+    
+    def __init__(self):
+        self.non_null = 0
+        self.types = Counter()
+        self.values = Counter()
+        self.sketch = None
+    
+    def add_chunk(self, values):
+        self.non_null += len(values)
+        types = Counter(map(type, values))
+        self.types.update(types)
+        if dict in types or list in types:
+            values = [hashable(value) for value in values]
+        chunk_counts = Counter(values)
         
-        for record in sample_data:
-            value = record.get(key)
-            values.append(value)
-            types.append(type(value).__name__)
+        if self.sketch is None:
+            self.values.update(chunk_counts)
+            if len(self.values) <= EXACT_DISTINCT_LIMIT:
+                return
+            self.sketch = HyperLogLog()
+            self.sketch.update(self.values)
+            # keep the most frequent values so far as top-k candidates
+            self.values = Counter(dict(self.values.most_common(EXACT_DISTINCT_LIMIT)))
+            return
         
-        non_null = [v for v in values if v is not None]
-        unique = set(non_null)
-        type_counts = Counter(types)
+        self.sketch.update(chunk_counts)
+        # past the limit only values already being tracked keep counting, for the top-k samples
+        for key in self.values:
+            count = chunk_counts.get(key)
+            if count:
+                self.values[key] += count
+    
+    def distinct(self):
+        return self.sketch.count() if self.sketch else len(self.values)
+    
+    def summary(self, key, total):
+        null_count = total - self.non_null
+        type_counts = Counter({value_type.__name__: count for value_type, count in self.types.items()})
+        if null_count:
+            type_counts['NoneType'] += null_count
         
         primary_type = type_counts.most_common(1)[0][0] if type_counts else 'unknown'
-        
-        total = len(values)
-        null_count = total - len(non_null)
-        unique_count = len(unique)
+        unique_count = self.distinct()
         null_pct = (null_count / total) * 100 if total > 0 else 0
+        category = categorize(key, None, primary_type, unique_count, total)
         
-        category = categorize(key, unique, primary_type, unique_count, total)
-        
-        info[key] = {
+        return {
             'primary_type': primary_type,
             'unique_count': unique_count,
             'null_count': null_count,
             'null_percentage': round(null_pct, 1),
             'category': category,
-            'sample_values': list(unique)[:5] if unique else []
+            'sample_values': [value for value, _ in self.values.most_common(SAMPLE_COUNT)]
         }
+
+def analyze_columns(data, sample_size=None, chunk_rows=CHUNK_ROWS):
+    """profiles every column in one pass over the records, the whole dataset unless sample_size is set"""
+    if sample_size:
+        data = islice(data, sample_size)
+    
+    columns = defaultdict(ColumnProfile)
+    total = 0
+    start = time.perf_counter()
+    
+    while True:
+        chunk = defaultdict(list)
+        rows = 0
+        for record in islice(data, chunk_rows):
+            rows += 1
+            for key, value in record.items():
+                # a missing key and a null value both count as null
+                column = chunk[key]
+                if value is not None:
+                    column.append(value)
+        if not rows:
+            break
+        
+        total += rows
+        for key, values in chunk.items():
+            columns[key].add_chunk(values)
+    
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else float(total)
+    print(f"Analyzed {total} records in {elapsed:.1f}s ({rate:.0f} records/sec)")
     
-    return info
+    return {key: columns[key].summary(key, total) for key in sorted(columns)}
 
 def categorize(key, unique_values, primary_type, unique_count, total_count):
     if key.lower().endswith('id') or key.lower().endswith('num') or key.lower().endswith('code'):
@@ -100,11 +192,18 @@ def print_by_category(info):
         for col in columns:
             print(f"  - {col}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="profile every column of the nypd dataset")
+    parser.add_argument("--file", default="data/nypd/data/2025_nypd.json", help="dataset (json array or json lines)")
+    parser.add_argument("--sample-size", type=int, default=None, help="only profile the first n records")
+    return parser.parse_args()
+
 def main():
     print("=== NYPD Dataset Column Inspector ===\n")
+    args = parse_args()
     
-    data = load_data()
-    info = analyze_columns(data)
+    data = load_data(args.file)
+    info = analyze_columns(data, args.sample_size)
     
     print_summary(info)
     print_by_category(info)
@@ -113,6 +212,7 @@ def main():
         json.dump(info, f, indent=2)
     
     print(f"\nSaved to: data/nypd/data/column_analysis.json")
+    report_peak_rss()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -2,21 +2,22 @@
 
 import json
 import os
+from nypd_stream import iter_records, report_peak_rss
 
 def load_data(file_path="data/nypd/data/2025_nypd.json"):
+    """streams the dataset, prints the first record's fields and returns the record count"""
     if not os.path.exists(file_path):
         print(f"Error: {file_path} not found!")
         return None
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        print(f"Loaded {file_path}")
-        print(f"Records: {len(data)}")
-        
-        if data:
-            record = data[0]
+        count = 0
+        for record in iter_records(file_path):
+            count += 1
+            if count > 1:
+                continue
+            
+            print(f"Loaded {file_path}")
             print(f"\nFields ({len(record.keys())}):")
             for key in sorted(record.keys()):
                 value = record[key]
@@ -29,7 +30,8 @@ def load_data(file_path="data/nypd/data/2025_nypd.json"):
                 
                 print(f"  {key:25} ({vtype:10}) = {sample}")
         
-        return data
+        print(f"\nRecords: {count}")
+        return count
         
     except json.JSONDecodeError as e:
         print(f"JSON error: {e}")
@@ -41,12 +43,13 @@ def load_data(file_path="data/nypd/data/2025_nypd.json"):
 def main():
     print("=== NYPD Dataset Loader ===\n")
     
-    dataset = load_data()
+    count = load_data()
     
-    if dataset:
-        print(f"\nLoaded {len(dataset)} records")
+    if count:
+        print(f"\nLoaded {count} records")
     else:
         print("\nFailed to load dataset")
+    report_peak_rss()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import mmap
+import os
+import sys
+import time
+from array import array
+from itertools import islice, repeat
+from nypd_stream import FLATTENED_JSON, FLATTENED_JSONL, COLUMNAR_DIR, iter_records, report_peak_rss
+
+RECOMMENDATIONS_FILE = "data/nypd/data/field_recommendations.json"
+META_FILE = "meta.json"
+CHUNK_ROWS = 50000
+NULL_CODE = -1
+DICTIONARY_MAX_DISTINCT = 1 << 16
+DICTIONARY_MAX_RATIO = 0.5
+
+def column_file_name(name, suffix):
+    # column names come from the dataset, keep them filesystem safe
+    safe = ''.join(char if char.isalnum() or char in '_-' else '_' for char in name)
+    return f"{safe}{suffix}"
+
+def load_field_decisions(recommendations_file = RECOMMENDATIONS_FILE):
+    """{field: 'drop' | 'keep_optional' | 'keep'} from handle_null_fields.py, empty when not run yet"""
+    if not recommendations_file or not os.path.exists(recommendations_file):
+        return {}
+    with open(recommendations_file, 'r') as f:
+        recommendations = json.load(f)
+    return {
+        field['field']: action
+        for action, fields in recommendations.items()
+        for field in fields
+    }
+
+def encode_value(value):
+    return json.dumps(value, sort_keys = True, separators = (',', ':'), ensure_ascii = False).encode('utf-8')
+
+class ColumnWriter:
+    """writes one column, dictionary encoded while its values repeat
+
+    dictionary: int32 codes on disk, distinct values in a json sidecar. a column with more than
+    DICTIONARY_MAX_DISTINCT distinct values, or where more than DICTIONARY_MAX_RATIO of the values
+    are distinct, is switched to plain: json encoded values back to back in one file and int64
+    end offsets in another (an empty value is null), so nothing is kept in memory per row
+    """
+
+    def __init__(self, directory, name, rows_before = 0):
+        self.directory = directory
+        self.name = name
+        self.codes_file = column_file_name(name, ".bin")
+        self.dictionary_file = column_file_name(name, ".dict.json")
+        self.values_file = column_file_name(name, ".values")
+        self.offsets_file = column_file_name(name, ".offsets")
+        self.file = open(os.path.join(directory, self.codes_file), 'wb')
+        self.plain = None
+        self.offset = 0
+        self.lookup = {}
+        self.values = []
+        self.rows = 0
+        self.nulls = 0
+        self.buffer = array('i')
+
+        # a column first seen part way through is null for every earlier row
+        if rows_before:
+            self.buffer.extend([NULL_CODE] * rows_before)
+            self.rows += rows_before
+            self.nulls += rows_before
+
+    def append(self, value):
+        self.rows += 1
+        if value is None:
+            self.nulls += 1
+        if self.plain is not None:
+            self.append_plain(b'' if value is None else encode_value(value))
+            return
+        if value is None:
+            self.buffer.append(NULL_CODE)
+            return
+        key = (type(value), json.dumps(value, sort_keys = True) if isinstance(value, (dict, list)) else value)
+        code = self.lookup.get(key)
+        if code is None:
+            code = self.lookup[key] = len(self.values)
+            self.values.append(value)
+        self.buffer.append(code)
+
+    def append_plain(self, data):
+        self.plain.write(data)
+        self.offset += len(data)
+        self.buffer.append(self.offset)
+
+    def mostly_distinct(self):
+        distinct = len(self.values)
+        return distinct > DICTIONARY_MAX_DISTINCT or distinct > (self.rows - self.nulls) * DICTIONARY_MAX_RATIO
+
+    def flush(self):
+        self.buffer.tofile(self.file)
+        del self.buffer[:]
+        if self.plain is None and self.values and self.mostly_distinct():
+            self.switch_to_plain()
+
+    def switch_to_plain(self):
+        """re-encodes the codes written so far as plain values and drops the dictionary"""
+        self.file.close()
+        codes_path = os.path.join(self.directory, self.codes_file)
+        encoded = [encode_value(value) for value in self.values]
+        self.lookup = None
+        self.values = None
+
+        self.plain = open(os.path.join(self.directory, self.values_file), 'wb')
+        self.file = open(os.path.join(self.directory, self.offsets_file), 'wb')
+        self.buffer = array('q', [0])
+        with open(codes_path, 'rb') as f:
+            while True:
+                codes = array('i')
+                try:
+                    codes.fromfile(f, CHUNK_ROWS)
+                except EOFError:
+                    # the last read comes up short, what was there is still in codes
+                    pass
+                if not codes:
+                    break
+                for code in codes:
+                    self.append_plain(b'' if code == NULL_CODE else encoded[code])
+                self.buffer.tofile(self.file)
+                del self.buffer[:]
+        os.remove(codes_path)
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        if self.plain is not None:
+            self.plain.close()
+            return {
+                'encoding': 'plain',
+                'offsets': self.offsets_file,
+                'values': self.values_file,
+                'nulls': self.nulls
+            }
+        with open(os.path.join(self.directory, self.dictionary_file), 'w', encoding = 'utf-8') as f:
+            json.dump(self.values, f, separators = (',', ':'))
+        return {
+            'encoding': 'dictionary',
+            'codes': self.codes_file,
+            'dictionary': self.dictionary_file,
+            'distinct': len(self.values),
+            'nulls': self.nulls
+        }
+
+def write_column_store(records, directory = COLUMNAR_DIR, decisions = None, chunk_rows = CHUNK_ROWS):
+    """writes records column by column, dropping the fields handle_null_fields.py marked 'drop'
+
+    returns the store metadata
+    """
+    decisions = decisions or {}
+    os.makedirs(directory, exist_ok = True)
+
+    writers = {}
+    dropped = set()
+    rows = 0
+
+    for record in records:
+        for name in record:
+            if name not in writers and name not in dropped:
+                if decisions.get(name) == 'drop':
+                    dropped.add(name)
+                else:
+                    writers[name] = ColumnWriter(directory, name, rows)
+        for name, writer in writers.items():
+            writer.append(record.get(name))
+        rows += 1
+        if rows % chunk_rows == 0:
+            for writer in writers.values():
+                writer.flush()
+
+    meta = {
+        'rows': rows,
+        'byteorder': sys.byteorder,
+        'dropped': sorted(dropped),
+        'columns': {}
+    }
+    for name, writer in writers.items():
+        column = writer.close()
+        # columns the analysis never saw are kept and treated as optional
+        column['required'] = decisions.get(name) == 'keep'
+        meta['columns'][name] = column
+
+    with open(os.path.join(directory, META_FILE), 'w') as f:
+        json.dump(meta, f, indent = 2)
+    return meta
+
+class ColumnStore:
+    """read side of the columnar store: memory maps only the columns that are asked for
+
+    dictionaries are read the first time their column is decoded and kept for reuse
+    """
+
+    def __init__(self, directory = COLUMNAR_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE), 'r') as f:
+            self.meta = json.load(f)
+        if self.meta['byteorder'] != sys.byteorder:
+            raise ValueError(f"{directory} was written on a {self.meta['byteorder']}-endian host")
+        self.rows = self.meta['rows']
+        self.columns = list(self.meta['columns'])
+        self.dictionaries = {}
+        self.maps = []
+
+    def map_file(self, file_name):
+        """read only memory map of a store file, empty bytes for an empty file"""
+        path = os.path.join(self.directory, file_name)
+        if not os.path.getsize(path):
+            return b''
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        self.maps.append(mapped)
+        return mapped
+
+    def is_plain(self, name):
+        return self.meta['columns'][name].get('encoding') == 'plain'
+
+    def codes(self, name):
+        """int32 codes for a dictionary column as a memoryview over the mapped file"""
+        return memoryview(self.map_file(self.meta['columns'][name]['codes'])).cast('i')
+
+    def dictionary(self, name):
+        """distinct values of a dictionary column with None appended, so the null code -1 decodes to None"""
+        values = self.dictionaries.get(name)
+        if values is None:
+            path = os.path.join(self.directory, self.meta['columns'][name]['dictionary'])
+            with open(path, 'r', encoding = 'utf-8') as f:
+                values = json.load(f)
+            values.append(None)
+            self.dictionaries[name] = values
+        return values
+
+    def decoder(self, name):
+        """decode(start, end) -> values of rows [start, end) of one column"""
+        if self.is_plain(name):
+            column = self.meta['columns'][name]
+            offsets = memoryview(self.map_file(column['offsets'])).cast('q')
+            values = self.map_file(column['values'])
+
+            def decode(start, end):
+                bounds = offsets[start:end + 1].tolist()
+                return [json.loads(values[low:high]) if high > low else None for low, high in zip(bounds, bounds[1:])]
+            return decode
+
+        codes = self.codes(name)
+
+        def decode(start, end):
+            return list(map(self.dictionary(name).__getitem__, codes[start:end]))
+        return decode
+
+    def column(self, name):
+        """decoded values of one column"""
+        return self.decoder(name)(0, self.rows)
+
+    def iter_records(self, columns = None, chunk_rows = CHUNK_ROWS):
+        """yields records holding only the requested columns (all columns by default)
+
+        a requested column the store does not have reads as None, the same as a missing json key
+        """
+        names = list(columns or self.columns)
+        decoders = [self.decoder(name) if name in self.meta['columns'] else None for name in names]
+
+        for start in range(0, self.rows, chunk_rows):
+            end = min(start + chunk_rows, self.rows)
+            values = [
+                decoder(start, end) if decoder else repeat(None, end - start)
+                for decoder in decoders
+            ]
+            for row in zip(*values):
+                yield dict(zip(names, row))
+
+    def close(self):
+        for mapped in self.maps:
+            try:
+                mapped.close()
+            except BufferError:
+                # a caller still holds a view into this column
+                pass
+        self.maps = []
+        self.dictionaries = {}
+
+def iter_store_records(directory, columns = None):
+    store = ColumnStore(directory)
+    try:
+        yield from store.iter_records(columns)
+    finally:
+        store.close()
+
+def store_size(directory):
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+def parse_args():
+    default_input = FLATTENED_JSONL if os.path.exists(FLATTENED_JSONL) else FLATTENED_JSON
+    parser = argparse.ArgumentParser(description = "convert the flattened nypd dataset into the columnar store")
+    parser.add_argument("--input", default = default_input, help = "flattened dataset (json array or json lines)")
+    parser.add_argument("--output", default = COLUMNAR_DIR, help = "store directory")
+    parser.add_argument("--recommendations", default = RECOMMENDATIONS_FILE,
+                        help = "handle_null_fields.py output used to drop columns")
+    parser.add_argument("--limit", type = int, default = None, help = "stop after this many records")
+    return parser.parse_args()
+
+def main():
+    print("=== NYPD Columnar Store Builder ===\n")
+    args = parse_args()
+
+    decisions = load_field_decisions(args.recommendations)
+    if not decisions:
+        print(f"no field recommendations at {args.recommendations}, keeping every column")
+
+    records = iter_records(args.input)
+    if args.limit:
+        records = islice(records, args.limit)
+
+    start = time.perf_counter()
+    meta = write_column_store(records, args.output, decisions)
+    elapsed = time.perf_counter() - start
+
+    print(f"wrote {meta['rows']} rows x {len(meta['columns'])} columns in {elapsed:.1f}s")
+    if meta['dropped']:
+        print(f"dropped {len(meta['dropped'])} columns: {', '.join(meta['dropped'])}")
+
+    input_size = os.path.getsize(args.input)
+    output_size = store_size(args.output)
+    print(f"size: {input_size / 1e6:.1f} mb -> {output_size / 1e6:.1f} mb")
+    print(f"saved to: {args.output}")
+    report_peak_rss()
+
+if __name__ == "__main__":
+    main()
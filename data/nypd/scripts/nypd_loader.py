@@ -0,0 +1,609 @@
+#!/usr/bin/env python3
+
+import ast
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from array import array
+from itertools import islice
+
+DEFAULT_BATCH_SIZE = 10000
+# initial open addressing slots per EntityTable, a power of two
+ENTITY_TABLE_SLOTS = 1024
+
+# how victims and suspects are modelled:
+#   node     - one node per person row, keyed by vicId / suspId
+#   profile  - one shared node per (age group, race, sex) combination
+#   property - demographics stored as indexed properties on the Incident, no separate nodes
+PERSON_MODELS = ('node', 'profile', 'property')
+UNKNOWN_VALUE = 'UNKNOWN'
+
+# (entity, label, property prefix, relationship type)
+PERSON_ENTITIES = [
+    ("victim", "Victim", "vic", "INVOLVES_VICTIM"),
+    ("suspect", "Suspect", "susp", "INVOLVES_SUSPECT"),
+]
+
+DEFAULT_CHECKPOINT = "data/nypd/data/load_checkpoint.json"
+SCHEMA_FILE = "data/nypd/sample_schema.cypher"
+INDEX_WAIT_SECONDS = 300
+
+SCHEMA_STATEMENT_PATTERN = re.compile(r'^CREATE\s+(?:CONSTRAINT|(?:\w+\s+)?INDEX)\b', re.IGNORECASE)
+
+# the flattened fields the load steps read, so a columnar source only maps these
+LOADER_COLUMNS = [
+    "cmplntNum", "cmplntStartDate", "cmplntEndDate", "cmplntStartTime", "cmplntEndTime",
+    "crimeStatus", "lawCategory", "spatialContext",
+    "borough", "precinct", "lonLat",
+    "offenseDescription", "offenseCode", "nypdCode",
+    "vicId", "vicAgeGroup", "vicRace", "vicSex",
+    "suspId", "suspAgeGroup", "suspRace", "suspSex",
+]
+
+# every write is a merge so a batch replayed after a crash does not duplicate anything
+# the merge and match keys are backed by the constraints and indexes in SCHEMA_FILE
+INCIDENT_QUERY = """
+UNWIND $rows AS incident
+MERGE (i:Incident {cmplntNum: incident.cmplntNum})
+SET i.contentHash = incident.contentHash,
+    i.cmplntStartDate = incident.cmplntStartDate,
+    i.cmplntEndDate = incident.cmplntEndDate,
+    i.cmplntStartTime = incident.cmplntStartTime,
+    i.cmplntEndTime = incident.cmplntEndTime,
+    i.crimeStatus = incident.crimeStatus,
+    i.lawCategory = incident.lawCategory,
+    i.spatialContext = incident.spatialContext
+"""
+
+# every incident in a precinct shares its Location, so lonLat is the first point seen and is never
+# overwritten - otherwise it would depend on which incident happened to be loaded last
+LOCATION_QUERY = """
+UNWIND $rows AS location
+MERGE (l:Location {borough: location.borough, precinct: location.precinct})
+ON CREATE SET l.lonLat = location.lonLat
+"""
+
+OFFENSE_QUERY = """
+UNWIND $rows AS offense
+MERGE (o:Offense {offenseDescription: offense.offenseDescription})
+SET o.offenseCode = offense.offenseCode, o.nypdCode = offense.nypdCode
+"""
+
+VICTIM_QUERY = """
+UNWIND $rows AS victim
+MERGE (v:Victim {vicId: victim.vicId})
+SET v.vicAgeGroup = victim.vicAgeGroup,
+    v.vicRace = victim.vicRace,
+    v.vicSex = victim.vicSex
+"""
+
+SUSPECT_QUERY = """
+UNWIND $rows AS suspect
+MERGE (s:Suspect {suspId: suspect.suspId})
+SET s.suspAgeGroup = suspect.suspAgeGroup,
+    s.suspRace = suspect.suspRace,
+    s.suspSex = suspect.suspSex
+"""
+
+# a changed incident may point at a different location, offense, victim or suspect now
+STALE_LINKS_QUERY = """
+UNWIND $rows AS incident
+MATCH (i:Incident {cmplntNum: incident.cmplntNum})-[r:OCCURRED_IN|CLASSIFIED_AS|INVOLVES_VICTIM|INVOLVES_SUSPECT]->()
+DELETE r
+"""
+
+EXISTING_HASHES_QUERY = """
+UNWIND $keys AS key
+MATCH (i:Incident {cmplntNum: key})
+RETURN i.cmplntNum AS cmplntNum, i.contentHash AS contentHash
+"""
+
+OCCURRED_IN_QUERY = """
+UNWIND $rows AS incident
+MATCH (i:Incident {cmplntNum: incident.cmplntNum})
+MATCH (l:Location {borough: incident.borough, precinct: incident.precinct})
+MERGE (i)-[:OCCURRED_IN]->(l)
+"""
+
+CLASSIFIED_AS_QUERY = """
+UNWIND $rows AS incident
+MATCH (i:Incident {cmplntNum: incident.cmplntNum})
+MATCH (o:Offense {offenseDescription: incident.offenseDescription})
+MERGE (i)-[:CLASSIFIED_AS]->(o)
+"""
+
+INVOLVES_VICTIM_QUERY = """
+UNWIND $rows AS incident
+MATCH (i:Incident {cmplntNum: incident.cmplntNum})
+MATCH (v:Victim {vicId: incident.vicId})
+MERGE (i)-[:INVOLVES_VICTIM]->(v)
+"""
+
+INVOLVES_SUSPECT_QUERY = """
+UNWIND $rows AS incident
+MATCH (i:Incident {cmplntNum: incident.cmplntNum})
+MATCH (s:Suspect {suspId: incident.suspId})
+MERGE (i)-[:INVOLVES_SUSPECT]->(s)
+"""
+
+def demographic_fields(prefix):
+    return [f"{prefix}AgeGroup", f"{prefix}Race", f"{prefix}Sex"]
+
+def profile_queries(label, prefix, rel_type):
+    """(profile node query, incident link query) for the shared profile model"""
+    key = ', '.join(f"{field}: row.{field}" for field in demographic_fields(prefix))
+    profile_query = f"UNWIND $rows AS row MERGE (p:{label} {{{key}}})"
+    link_query = (
+        "UNWIND $rows AS row "
+        "MATCH (i:Incident {cmplntNum: row.cmplntNum}) "
+        f"MATCH (p:{label} {{{key}}}) "
+        f"MERGE (i)-[:{rel_type}]->(p)"
+    )
+    return profile_query, link_query
+
+def property_query(prefix):
+    """copies the demographics onto the incident for the property model"""
+    assignments = ', '.join(f"i.{field} = row.{field}" for field in demographic_fields(prefix))
+    return f"UNWIND $rows AS row MATCH (i:Incident {{cmplntNum: row.cmplntNum}}) SET {assignments}"
+
+VICTIM_PROFILE_QUERY, VICTIM_PROFILE_LINK_QUERY = profile_queries("Victim", "vic", "INVOLVES_VICTIM")
+SUSPECT_PROFILE_QUERY, SUSPECT_PROFILE_LINK_QUERY = profile_queries("Suspect", "susp", "INVOLVES_SUSPECT")
+
+# (entity, query, key in the prepared batch) - nodes first, then the relationships between them
+# steps whose rows are empty for the chosen person models are skipped
+LOAD_STEPS = [
+    ("stale_links", STALE_LINKS_QUERY, "stale"),
+    ("incidents", INCIDENT_QUERY, "incidents"),
+    ("locations", LOCATION_QUERY, "locations"),
+    ("offenses", OFFENSE_QUERY, "offenses"),
+    ("victims", VICTIM_QUERY, "victims"),
+    ("suspects", SUSPECT_QUERY, "suspects"),
+    ("victim_profiles", VICTIM_PROFILE_QUERY, "victim_profiles"),
+    ("suspect_profiles", SUSPECT_PROFILE_QUERY, "suspect_profiles"),
+    ("victim_properties", property_query("vic"), "victim_properties"),
+    ("suspect_properties", property_query("susp"), "suspect_properties"),
+    ("occurred_in", OCCURRED_IN_QUERY, "occurred_in"),
+    ("classified_as", CLASSIFIED_AS_QUERY, "classified_as"),
+    ("involves_victim", INVOLVES_VICTIM_QUERY, "involves_victim"),
+    ("involves_suspect", INVOLVES_SUSPECT_QUERY, "involves_suspect"),
+    ("victim_profile_links", VICTIM_PROFILE_LINK_QUERY, "victim_profile_links"),
+    ("suspect_profile_links", SUSPECT_PROFILE_LINK_QUERY, "suspect_profile_links"),
+]
+
+class Interner:
+    """maps each distinct value of a field to a small integer code"""
+    __slots__ = ('codes', 'values')
+    
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+    
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+class EntityTable:
+    """unique entities of one label, stored without a python object per entity
+
+    the first key_size fields are the natural key; keys are encoded to bytes in one bytearray
+    with int64 end offsets, and found again through an open addressing table of node ids in an
+    int64 array. the other fields are interned per field into int32 code arrays. node ids are
+    assigned 0, 1, 2... in insertion order and never change, so they can serve as bulk import ids
+
+    measured with benchmark_node_cache.py on 200k rows: about 54 bytes per entity against 396 for
+    a dict of tuples (7.4x smaller), but adds and lookups run about 2.5x slower, since every key
+    is encoded to bytes and compared in python. worth it when the entity count, not cpu, is the limit
+    """
+    __slots__ = ('fields', 'key_size', 'key_bytes', 'key_ends', 'slots', 'interners', 'columns')
+    
+    def __init__(self, fields, key_size = 1):
+        self.fields = tuple(fields)
+        self.key_size = key_size
+        self.key_bytes = bytearray()
+        self.key_ends = array('q')
+        # node id per slot, -1 for empty; kept at most half full
+        self.slots = array('q', [-1]) * ENTITY_TABLE_SLOTS
+        self.interners = [Interner() for _ in self.fields[key_size:]]
+        self.columns = [array('i') for _ in self.fields[key_size:]]
+    
+    def __len__(self):
+        return len(self.key_ends)
+    
+    def encode_key(self, values):
+        key = values[0] if self.key_size == 1 else values[:self.key_size]
+        if type(key) is str:
+            return b's' + key.encode('utf-8')
+        # repr keeps ints and strings apart, so (borough, 5) and (borough, '5') stay distinct
+        return b'r' + repr(key).encode('utf-8')
+    
+    def key_at(self, node_id):
+        start = self.key_ends[node_id - 1] if node_id else 0
+        return self.key_bytes[start:self.key_ends[node_id]]
+    
+    def find(self, encoded):
+        """(slot index, node id) for an encoded key, node id None when it is not in the table"""
+        slots = self.slots
+        mask = len(slots) - 1
+        index = hash(encoded) & mask
+        while True:
+            node_id = slots[index]
+            if node_id < 0:
+                return index, None
+            if self.key_at(node_id) == encoded:
+                return index, node_id
+            index = (index + 1) & mask
+    
+    def grow(self):
+        self.slots = array('q', [-1]) * (len(self.slots) * 2)
+        mask = len(self.slots) - 1
+        for node_id in range(len(self)):
+            index = hash(bytes(self.key_at(node_id))) & mask
+            while self.slots[index] >= 0:
+                index = (index + 1) & mask
+            self.slots[index] = node_id
+    
+    def add(self, *values):
+        """returns (node id, is_new)"""
+        encoded = self.encode_key(values)
+        index, node_id = self.find(encoded)
+        if node_id is not None:
+            return node_id, False
+        
+        key_ends = self.key_ends
+        node_id = len(key_ends)
+        self.key_bytes += encoded
+        key_ends.append(len(self.key_bytes))
+        self.slots[index] = node_id
+        for column, interner, value in zip(self.columns, self.interners, values[self.key_size:]):
+            column.append(interner.code(value))
+        if len(key_ends) * 2 > len(self.slots):
+            self.grow()
+        return node_id, True
+    
+    def node_id(self, *key_values):
+        """id of an entity by its natural key, None when it has not been added"""
+        return self.find(self.encode_key(key_values))[1]
+    
+    def get(self, node_id):
+        encoded = bytes(self.key_at(node_id))
+        if encoded[:1] == b's':
+            key_values = (encoded[1:].decode('utf-8'),)
+        else:
+            key = ast.literal_eval(encoded[1:].decode('utf-8'))
+            key_values = key if self.key_size > 1 else (key,)
+        entity = dict(zip(self.fields, key_values))
+        for field, interner, column in zip(self.fields[self.key_size:], self.interners, self.columns):
+            entity[field] = interner.values[column[node_id]]
+        return entity
+    
+    def __iter__(self):
+        return (self.get(node_id) for node_id in range(len(self)))
+
+class NodeCache:
+    """dedup cache for the shared nypd node types, each add returns (node id, is_new)"""
+    __slots__ = ('locations', 'offenses', 'victims', 'suspects')
+    
+    def __init__(self):
+        self.locations = EntityTable(('borough', 'precinct', 'lonLat'), key_size = 2)
+        self.offenses = EntityTable(('offenseDescription', 'offenseCode', 'nypdCode'))
+        self.victims = EntityTable(('vicId', 'vicAgeGroup', 'vicRace', 'vicSex'))
+        self.suspects = EntityTable(('suspId', 'suspAgeGroup', 'suspRace', 'suspSex'))
+    
+    def add_location(self, borough, precinct, lonlat):
+        return self.locations.add(borough, precinct, lonlat)
+    
+    def add_offense(self, description, code, nypd_code):
+        return self.offenses.add(description, code, nypd_code)
+    
+    def add_victim(self, vic_id, age_group, race, sex):
+        return self.victims.add(vic_id, age_group, race, sex)
+    
+    def add_suspect(self, susp_id, age_group, race, sex):
+        return self.suspects.add(susp_id, age_group, race, sex)
+    
+    def get_stats(self):
+        return {
+            'locations': len(self.locations),
+            'offenses': len(self.offenses),
+            'victims': len(self.victims),
+            'suspects': len(self.suspects)
+        }
+
+def read_schema_statements(schema_file = SCHEMA_FILE):
+    """the constraint and index statements declared in the schema file"""
+    with open(schema_file, 'r', encoding = 'utf-8') as f:
+        text = '\n'.join(line.split('//', 1)[0] for line in f)
+
+    statements = (' '.join(statement.split()) for statement in text.split(';'))
+    return [statement for statement in statements if SCHEMA_STATEMENT_PATTERN.match(statement)]
+
+def ensure_schema(driver, schema_file = SCHEMA_FILE, timeout = INDEX_WAIT_SECONDS):
+    """creates the declared constraints and indexes and waits until they are online"""
+    statements = read_schema_statements(schema_file)
+    print(f"ensuring {len(statements)} constraints and indexes...")
+
+    with driver.session() as session:
+        for statement in statements:
+            session.run(statement).consume()
+        # merges against an index that is still populating fall back to label scans
+        session.run("CALL db.awaitIndexes($timeout)", timeout = timeout).consume()
+
+    print("constraints and indexes online")
+    return statements
+
+def iter_batches(records, batch_size):
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def record_hash(record):
+    """stable digest of a flattened record, stored on its incident to detect changes"""
+    content = {key: value for key, value in record.items() if key != 'contentHash'}
+    payload = json.dumps(content, sort_keys = True, default = str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def filter_changed(session, records):
+    """drops records whose incident is already stored with the same content hash
+
+    returns (changed records, cmplntNums of the changed ones that already exist)
+    """
+    keys = [record['cmplntNum'] for record in records if record.get('cmplntNum')]
+    result = session.run(EXISTING_HASHES_QUERY, keys = keys)
+    existing = {row['cmplntNum']: row['contentHash'] for row in result}
+
+    changed = [record for record in records if existing.get(record.get('cmplntNum')) != record['contentHash']]
+    stale = {record['cmplntNum'] for record in changed if record.get('cmplntNum') in existing}
+    return changed, stale
+
+def value_or(record, key, default):
+    # projected records carry every loader column, so a missing value shows up as None
+    value = record.get(key)
+    return default if value is None else value
+
+def default_person_models():
+    """{'victim': model, 'suspect': model} from NYPD_VICTIM_MODEL / NYPD_SUSPECT_MODEL"""
+    models = {}
+    for entity, _, _, _ in PERSON_ENTITIES:
+        model = os.getenv(f"NYPD_{entity.upper()}_MODEL", "node").lower()
+        if model not in PERSON_MODELS:
+            raise ValueError(f"NYPD_{entity.upper()}_MODEL must be one of {', '.join(PERSON_MODELS)}, got {model!r}")
+        models[entity] = model
+    return models
+
+def prepare_batch(records, node_cache = None, stale = (), models = None):
+    """splits a batch of flattened records into the parameter lists for each load step
+
+    locations and offenses are deduplicated within the batch, and across batches when a
+    node cache (anything with add_location / add_offense returning (node id, is_new)) is given
+    models picks the victim / suspect modelling, see PERSON_MODELS
+    """
+    models = models or default_person_models()
+    prepared = {key: [] for _, _, key in LOAD_STEPS}
+    locations = {}
+    offenses = {}
+    profiles = {entity: set() for entity, _, _, _ in PERSON_ENTITIES}
+
+    for record in records:
+        if not record.get('cmplntNum'):
+            continue
+        prepared['incidents'].append(record)
+        if record['cmplntNum'] in stale:
+            prepared['stale'].append(record)
+
+        if record.get('borough') and record.get('precinct'):
+            key = (record['borough'], record['precinct'])
+            if key not in locations:
+                location = {
+                    'borough': record['borough'],
+                    'precinct': record['precinct'],
+                    'lonLat': value_or(record, 'lonLat', 'UNKNOWN')
+                }
+                is_new = True
+                if node_cache is not None:
+                    _, is_new = node_cache.add_location(location['borough'], location['precinct'], location['lonLat'])
+                locations[key] = location if is_new else None
+            prepared['occurred_in'].append(record)
+
+        if record.get('offenseDescription'):
+            key = record['offenseDescription']
+            if key not in offenses:
+                offense = {
+                    'offenseDescription': key,
+                    'offenseCode': value_or(record, 'offenseCode', 0),
+                    'nypdCode': value_or(record, 'nypdCode', 'UNKNOWN')
+                }
+                is_new = True
+                if node_cache is not None:
+                    _, is_new = node_cache.add_offense(key, offense['offenseCode'], offense['nypdCode'])
+                offenses[key] = offense if is_new else None
+            prepared['classified_as'].append(record)
+
+        for entity, _, prefix, _ in PERSON_ENTITIES:
+            model = models[entity]
+            if model == 'node':
+                if record.get(f"{prefix}Id") is not None:
+                    prepared[f"{entity}s"].append(record)
+                    prepared[f"involves_{entity}"].append(record)
+                continue
+
+            fields = demographic_fields(prefix)
+            values = [record.get(field) for field in fields]
+            if all(value is None for value in values):
+                continue
+            if model == 'property':
+                prepared[f"{entity}_properties"].append(dict(zip(fields, values), cmplntNum = record['cmplntNum']))
+                continue
+
+            # merge keys cannot be null, so a missing demographic joins the UNKNOWN profile
+            key = tuple(UNKNOWN_VALUE if value is None else value for value in values)
+            row = dict(zip(fields, key))
+            if key not in profiles[entity]:
+                profiles[entity].add(key)
+                prepared[f"{entity}_profiles"].append(row)
+            prepared[f"{entity}_profile_links"].append(dict(row, cmplntNum = record['cmplntNum']))
+
+    prepared['locations'] = [location for location in locations.values() if location]
+    prepared['offenses'] = [offense for offense in offenses.values() if offense]
+    return prepared
+
+def write_batch(tx, prepared):
+    """runs every load step for one batch inside a single transaction"""
+    timings = {}
+    for entity, query, key in LOAD_STEPS:
+        rows = prepared[key]
+        if not rows:
+            continue
+        start = time.perf_counter()
+        tx.run(query, rows = rows).consume()
+        timings[entity] = (len(rows), time.perf_counter() - start)
+    return timings
+
+def prefetch(iterable, depth = 2):
+    """reads ahead on a background thread so parsing the next batch overlaps the current write"""
+    buffer = queue.Queue(maxsize = depth)
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                buffer.put(item)
+        except Exception as e:
+            buffer.put(e)
+        buffer.put(done)
+
+    threading.Thread(target = produce, daemon = True).start()
+
+    while True:
+        item = buffer.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+def read_checkpoint(checkpoint_path, source):
+    """rows already committed from source, 0 when there is no unfinished checkpoint for it"""
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return 0
+    try:
+        with open(checkpoint_path, 'r') as f:
+            checkpoint = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return 0
+    if checkpoint.get('source') != os.path.abspath(source) or checkpoint.get('complete'):
+        return 0
+    return checkpoint.get('rows', 0)
+
+def write_checkpoint(checkpoint_path, source, rows, complete = False):
+    if not checkpoint_path:
+        return
+    directory = os.path.dirname(checkpoint_path)
+    if directory:
+        os.makedirs(directory, exist_ok = True)
+    checkpoint = {
+        'source': os.path.abspath(source),
+        'rows': rows,
+        'complete': complete,
+        'updated': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    temp_path = checkpoint_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, checkpoint_path)
+
+def clear_checkpoint(checkpoint_path):
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+def clear_graph(driver, batch_size = DEFAULT_BATCH_SIZE):
+    """deletes everything in chunks so a full-size graph does not need one huge transaction"""
+    print("clearing existing data...")
+    with driver.session() as session:
+        session.run(
+            "MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF $size ROWS",
+            size = batch_size
+        ).consume()
+    print("database cleared")
+
+def prepare_batches(driver, records, batch_size, node_cache = None, incremental = False, models = None):
+    """yields (rows read, rows unchanged, prepared batch) for each batch of the source
+
+    in incremental mode unchanged records are filtered out here, on the read-ahead thread
+    """
+    session = driver.session() if incremental else None
+    try:
+        for batch in iter_batches(records, batch_size):
+            for record in batch:
+                record['contentHash'] = record_hash(record)
+
+            changed, stale = batch, ()
+            if incremental:
+                changed, stale = filter_changed(session, batch)
+
+            yield len(batch), len(batch) - len(changed), prepare_batch(changed, node_cache, stale, models)
+    finally:
+        if session is not None:
+            session.close()
+
+def load_dataset(driver, records, source, batch_size = DEFAULT_BATCH_SIZE,
+                 checkpoint_path = DEFAULT_CHECKPOINT, node_cache = None, limit = None,
+                 incremental = False, models = None):
+    """loads flattened records in batches of batch_size rows, one transaction per batch
+
+    the checkpoint is advanced after every commit, so a rerun skips the rows already loaded
+    incremental mode upserts only records whose content hash differs from the stored one
+    models overrides the victim / suspect modelling from the environment
+    returns {entity: (rows, seconds)} plus the total rows committed
+    """
+    skip = read_checkpoint(checkpoint_path, source)
+    if skip:
+        print(f"resuming after {skip} committed rows")
+        records = islice(records, skip, None)
+    if limit is not None:
+        records = islice(records, max(limit - skip, 0))
+
+    totals = {entity: [0, 0.0] for entity, _, _ in LOAD_STEPS}
+    committed = skip
+    unchanged = 0
+    start = time.perf_counter()
+
+    models = models or default_person_models()
+    print(f"victims modelled as {models['victim']}, suspects as {models['suspect']}")
+    batches = prepare_batches(driver, records, batch_size, node_cache, incremental, models)
+
+    with driver.session() as session:
+        for size, skipped, prepared in prefetch(batches):
+            unchanged += skipped
+            timings = session.execute_write(write_batch, prepared)
+            committed += size
+            write_checkpoint(checkpoint_path, source, committed)
+
+            for entity, (rows, seconds) in timings.items():
+                totals[entity][0] += rows
+                totals[entity][1] += seconds
+
+            elapsed = time.perf_counter() - start
+            rate = (committed - skip) / elapsed if elapsed > 0 else 0.0
+            print(f"  committed {committed} rows ({rate:.0f} rows/sec)")
+
+    write_checkpoint(checkpoint_path, source, committed, complete = True)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nloaded {committed - skip} rows in {elapsed:.1f}s")
+    if incremental:
+        print(f"  skipped {unchanged} unchanged rows")
+    for entity, (rows, seconds) in totals.items():
+        if rows:
+            rate = rows / seconds if seconds > 0 else float(rows)
+            print(f"  - {entity}: {rows} rows ({rate:.0f} rows/sec)")
+
+    return {'rows': committed, 'unchanged': unchanged, 'entities': {entity: tuple(value) for entity, value in totals.items()}}
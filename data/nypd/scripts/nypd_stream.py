@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import re
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+READ_SIZE = 1 << 16
+
+FLATTENED_JSONL = "data/nypd/data/flattened_nypd_data.jsonl"
+FLATTENED_JSON = "data/nypd/data/flattened_nypd_data.json"
+COLUMNAR_DIR = "data/nypd/data/flattened_nypd_data.columns"
+
+# everything up to the next bracket: plain text and whole json strings, which may contain brackets
+ARRAY_SKIP = re.compile(r'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+JSON_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+SCALAR_END = re.compile(r'[\s,\]]')
+
+def default_flattened_path():
+    """the flattened dataset: the columnar store, then json lines, then the json array"""
+    for path in (COLUMNAR_DIR, FLATTENED_JSONL):
+        if os.path.exists(path):
+            return path
+    if os.path.exists(FLATTENED_JSON):
+        return FLATTENED_JSON
+    return FLATTENED_JSONL
+
+def detect_format(f):
+    """'array' or 'lines' from the first non-whitespace character, None for an empty file"""
+    first_char = ''
+    while True:
+        char = f.read(1)
+        if not char or not char.isspace():
+            first_char = char
+            break
+    f.seek(0)
+    
+    if first_char == '[':
+        return 'array'
+    return 'lines' if first_char else None
+
+def iter_records(file_path, read_size = READ_SIZE, columns = None):
+    """yields records one at a time from a json array, a json lines file or a columnar store
+
+    with columns set every record holds exactly those keys, None where a value is missing
+    """
+    if os.path.isdir(file_path):
+        # imported here because the columnar module builds on this one
+        from nypd_columnar import iter_store_records
+        yield from iter_store_records(file_path, columns)
+        return
+    
+    with open(file_path, 'r', encoding = 'utf-8') as f:
+        file_format = detect_format(f)
+        
+        if file_format == 'array':
+            records = iter_json_array(f, read_size)
+        elif file_format == 'lines':
+            records = iter_json_lines(f)
+        else:
+            return
+        
+        if columns is None:
+            yield from records
+        else:
+            for record in records:
+                yield {name: record.get(name) for name in columns}
+
+def read_array_start(f, read_size):
+    """reads up to the opening bracket of a top level json array, returns the text after it"""
+    # leading whitespace can be longer than one read
+    buffer = ''
+    while not buffer:
+        text = f.read(read_size)
+        if not text:
+            raise ValueError("unexpected end of file before json array")
+        buffer = text.lstrip()
+    if buffer[0] != '[':
+        raise ValueError(f"expected a json array, found {buffer[0]!r}")
+    return buffer[1:]
+
+def iter_json_array(f, read_size = READ_SIZE):
+    """incremental parser for a top level json array of objects"""
+    decoder = json.JSONDecoder()
+    buffer = read_array_start(f, read_size)
+    pos = 0
+    eof = False
+    
+    while True:
+        # skip whitespace and separators between elements
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ','):
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos = f.read(read_size), 0
+            eof = not buffer
+        
+        if pos >= len(buffer):
+            raise ValueError("unexpected end of file inside json array")
+        if buffer[pos] == ']':
+            return
+        
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # element straddles the read boundary - pull in more text and retry
+            if eof:
+                raise
+            more = f.read(read_size)
+            eof = not more
+            buffer = buffer[pos:] + more
+            pos = 0
+            continue
+        
+        yield record
+        pos = end
+        
+        # drop consumed text so the buffer stays around one read in size
+        if pos > read_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+def iter_json_array_text(f, read_size = READ_SIZE):
+    """yields the raw text of each element of a top level json array without decoding it
+
+    the scan stops only at brackets, strings and plain text are skipped by a regex, so the
+    parsing itself can be left to worker processes
+    """
+    buffer = read_array_start(f, read_size)
+    pos = 0
+    start = None
+    depth = 0
+    eof = False
+    
+    while True:
+        if start is None:
+            # skip whitespace and separators between elements
+            while True:
+                while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ','):
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    break
+                buffer, pos = f.read(read_size), 0
+                eof = not buffer
+            
+            if pos >= len(buffer):
+                raise ValueError("unexpected end of file inside json array")
+            if buffer[pos] == ']':
+                return
+            start = pos
+            depth = 0
+        
+        first = buffer[start]
+        if first in '{[':
+            # brackets inside the element, until the one that closes it
+            while True:
+                pos = ARRAY_SKIP.match(buffer, pos).end()
+                if pos >= len(buffer) or buffer[pos] == '"':
+                    end = None
+                    break
+                depth += 1 if buffer[pos] in '{[' else -1
+                pos += 1
+                if depth == 0:
+                    end = pos
+                    break
+        elif first == '"':
+            match = JSON_STRING.match(buffer, start)
+            end = match.end() if match else None
+        else:
+            # number, true, false or null
+            match = SCALAR_END.search(buffer, start)
+            end = match.start() if match else None
+        
+        if end is None:
+            # element straddles the read boundary - pull in more text and carry on scanning
+            if eof:
+                raise ValueError("unexpected end of file inside json array")
+            more = f.read(read_size)
+            eof = not more
+            buffer = buffer[start:] + more
+            pos -= start
+            start = 0
+            continue
+        
+        yield buffer[start:end]
+        start = None
+        pos = end
+        
+        # drop consumed text so the buffer stays around one read in size
+        if pos > read_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+def iter_json_lines(f):
+    """one json document per line, blank lines ignored"""
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def peak_rss_mb():
+    """peak resident set size of this process in mb, None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macos reports bytes
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def report_peak_rss():
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"peak rss: {peak:.1f} mb")
@@ -1,5 +1,10 @@
 from openai import OpenAI
-from config.settings import OPENAI_API_KEY, MODEL, TEMPERATURE, USE_MOCK_LLM
+from config.settings import (
+    OPENAI_API_KEY, MODEL, TEMPERATURE, USE_MOCK_LLM,
+    LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE
+)
+from services.rate_limiter import RateLimiter, estimate_tokens
+from services.llm_cache import get_llm_cache
 import re
 
 # initialize openai client for real mode with proper validation
@@ -10,6 +15,36 @@ if not USE_MOCK_LLM and OPENAI_API_KEY and not OPENAI_API_KEY.startswith("sk-...
     except Exception:
         client = None
 
+# shared by every concurrent llm caller in the process
+llm_rate_limiter = RateLimiter(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+
+def chat_completion(prompt: str, model: str = MODEL, temperature: float = TEMPERATURE,
+                    max_tokens: int = None) -> str:
+    """single-prompt chat completion, answered from the response cache when possible"""
+    cache = get_llm_cache()
+    key = None
+    if cache:
+        key = cache.make_key(model, temperature, prompt, max_tokens)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    
+    # only real api calls count against the rate limits
+    llm_rate_limiter.acquire(estimate_tokens(prompt) + (max_tokens or 0))
+    
+    options = {"max_tokens": max_tokens} if max_tokens else {}
+    response = client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        **options
+    )
+    content = response.choices[0].message.content
+    
+    if cache and content:
+        cache.set(key, content)
+    return content
+
 def is_safe_query(query: str) -> bool:
     """check if query is read-only and safe to execute"""
     query_upper = query.upper().strip()
@@ -125,13 +160,7 @@ def generate_cypher_real(prompt: str) -> str:
         return generate_cypher_mock(prompt)
     
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=TEMPERATURE,
-            max_tokens=500
-        )
-        raw_response = response.choices[0].message.content.strip()
+        raw_response = chat_completion(prompt, max_tokens=500).strip()
         return extract_cypher_from_response(raw_response)
     except Exception as e:
         # fallback to mock on any api error
@@ -1,6 +1,61 @@
+import atexit
+import re
+import threading
 from neo4j import GraphDatabase
 from neo4j.exceptions import ServiceUnavailable, AuthError, DriverError
-from config.settings import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, USE_MOCK_NEO4J
+from config.settings import (
+    NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, USE_MOCK_NEO4J,
+    NEO4J_MAX_POOL_SIZE, NEO4J_ACQUISITION_TIMEOUT,
+    NEO4J_LIVENESS_CHECK_TIMEOUT, NEO4J_MAX_CONNECTION_LIFETIME, NEO4J_FETCH_SIZE
+)
+
+WRITE_CLAUSE_PATTERN = re.compile(
+    r'\b(CREATE|MERGE|DELETE|DETACH|SET|REMOVE|DROP|CALL|UNION|FOREACH|LOAD)\b', re.IGNORECASE
+)
+RETURN_PATTERN = re.compile(r'\bRETURN\b', re.IGNORECASE)
+TRAILING_LIMIT_PATTERN = re.compile(r'\s+LIMIT\s+(\S+)\s*$', re.IGNORECASE)
+
+# process-wide driver, created lazily on first use and shared by every caller
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def get_driver():
+    """return the shared pooled driver, creating it on first call"""
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                _driver = GraphDatabase.driver(
+                    NEO4J_URI,
+                    auth=(NEO4J_USER, NEO4J_PASSWORD),
+                    max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+                    connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+                    liveness_check_timeout=NEO4J_LIVENESS_CHECK_TIMEOUT,
+                    max_connection_lifetime=NEO4J_MAX_CONNECTION_LIFETIME
+                )
+    return _driver
+
+
+def close_driver() -> None:
+    """close the shared driver and release all pooled connections"""
+    global _driver
+    with _driver_lock:
+        if _driver is not None:
+            try:
+                _driver.close()
+            finally:
+                _driver = None
+
+
+def get_session(**kwargs):
+    """open a session on the shared driver for callers running several statements in a row"""
+    return get_driver().session(**kwargs)
+
+
+# make sure pooled connections are closed cleanly when the process exits
+atexit.register(close_driver)
+
 
 def run_cypher_mock(query: str) -> list:
     """mock neo4j responses with sample data"""
@@ -36,38 +91,106 @@ def create_error_response(error_type: str, message: str) -> list:
     """create structured error response for the output formatter"""
     return [{"status": "database_error", "error_type": error_type, "message": message}]
 
-def run_cypher_real(query: str) -> list:
-    """real neo4j database query execution with detailed error handling"""
-    try:
-        with GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD)) as driver:
-            with driver.session() as session:
-                result = session.run(query)
-                records = [dict(record) for record in result]
-                return records
-    except ServiceUnavailable:
+def error_response_for(error: Exception) -> list:
+    """maps a driver exception to the structured error response"""
+    if isinstance(error, ServiceUnavailable):
         return create_error_response(
             "connection_failed", 
             "Neo4j database is not available. Please check if the database is running."
         )
-    except AuthError:
+    if isinstance(error, AuthError):
+        # reset the pooled driver: the next call builds a fresh one and authenticates again
+        # (NEO4J_USER / NEO4J_PASSWORD are read once at import, so a fix there needs a restart)
+        close_driver()
         return create_error_response(
             "authentication_failed",
             "Authentication failed. Please check your database credentials."
         ) 
-    except DriverError as e:
+    if isinstance(error, DriverError):
         return create_error_response(
             "driver_error",
-            f"Database driver error: {str(e)}"
+            f"Database driver error: {str(error)}"
         )
+    return create_error_response(
+        "unknown_error", 
+        f"Unexpected database error: {str(error)}"
+    )
+
+def run_cypher_real(query: str, parameters: dict = None) -> list:
+    """real neo4j database query execution with detailed error handling"""
+    try:
+        # sessions are cheap - they borrow an already open connection from the pool
+        with get_session() as session:
+            result = session.run(query, parameters or {})
+            records = [dict(record) for record in result]
+            return records
     except Exception as e:
-        return create_error_response(
-            "unknown_error", 
-            f"Unexpected database error: {str(e)}"
-        )
+        return error_response_for(e)
+
+def stream_cypher_real(query: str, parameters: dict = None, max_rows: int = None,
+                       fetch_size: int = NEO4J_FETCH_SIZE):
+    """yields records lazily, pulling fetch_size records per round trip
+
+    stops after max_rows and tells the server to discard the rest of the result
+    """
+    try:
+        with get_session(fetch_size=fetch_size) as session:
+            result = session.run(query, parameters or {})
+            for count, record in enumerate(result):
+                if max_rows is not None and count >= max_rows:
+                    break
+                yield dict(record)
+            result.consume()
+    except Exception as e:
+        yield from error_response_for(e)
 
-def run_cypher(query: str) -> list:
+def apply_row_limit(query: str, limit: int) -> str:
+    """caps a read query at limit rows by appending or tightening a trailing LIMIT
+
+    queries that write, call procedures or use UNION are returned unchanged
+    """
+    statement = query.strip().rstrip(';').rstrip()
+    if WRITE_CLAUSE_PATTERN.search(statement) or not RETURN_PATTERN.search(statement):
+        return query
+    
+    match = TRAILING_LIMIT_PATTERN.search(statement)
+    if match:
+        if match.group(1).isdigit():
+            if int(match.group(1)) <= limit:
+                return statement
+            return f"{statement[:match.start()]} LIMIT {limit}"
+        # parameter or expression limit - leave it alone
+        return query
+    
+    return f"{statement} LIMIT {limit}"
+
+def run_write_transaction(statements: list) -> dict:
+    """runs (query, parameters) pairs in one explicit write transaction
+
+    unlike run_cypher_real this raises on failure so callers can retry or split the batch
+    """
+    def work(tx):
+        totals = {"nodes_created": 0, "relationships_created": 0, "properties_set": 0}
+        for query, parameters in statements:
+            counters = tx.run(query, parameters or {}).consume().counters
+            totals["nodes_created"] += counters.nodes_created
+            totals["relationships_created"] += counters.relationships_created
+            totals["properties_set"] += counters.properties_set
+        return totals
+    
+    with get_session() as session:
+        return session.execute_write(work)
+
+def run_cypher(query: str, parameters: dict = None) -> list:
     """main entry point - routes to mock or real based on toggle"""
     if USE_MOCK_NEO4J:
         return run_cypher_mock(query)
     else:
-        return run_cypher_real(query) 
\ No newline at end of file
+        return run_cypher_real(query, parameters)
+
+def run_cypher_stream(query: str, parameters: dict = None, max_rows: int = None):
+    """streaming entry point - routes to mock or real based on toggle"""
+    if USE_MOCK_NEO4J:
+        return iter(run_cypher_mock(query)[:max_rows])
+    else:
+        return stream_cypher_real(query, parameters, max_rows) 
\ No newline at end of file
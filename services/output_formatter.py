@@ -1,83 +1,152 @@
-def format_table(results: list) -> str:
-    """format results as a clean table with headers"""
-    if not results:
-        return "no results found"
-    
-    # extract all unique column names from results
-    columns = set()
+from itertools import islice
+from config.settings import QUERY_PREVIEW_ROWS, TABLE_MAX_COLUMN_WIDTH
+
+STREAM_MIN_COLUMN_WIDTH = 12
+
+
+def display_column_name(col: str) -> str:
+    """clean up column names for display"""
+    # convert p.name to Name, c.name to Country, etc
+    if '.' in col:
+        prefix, suffix = col.split('.', 1)
+        if suffix == 'name':
+            if prefix == 'p':
+                return 'Name'
+            elif prefix == 'c':
+                return 'Country'
+            elif prefix == 'pr':
+                return 'Product'
+        return suffix.title()
+    return col.title()
+
+
+def truncate_cell(value, max_width: int) -> str:
+    """str() a value once and cut it down to max_width characters"""
+    text = str(value).replace('\n', ' ')
+    if len(text) > max_width:
+        return text[:max_width - 1] + '…'
+    return text
+
+
+def take_display_rows(results, max_rows: int):
+    """reads at most max_rows dict records (plus one to detect more) from any iterable"""
+    rows = []
+    more = False
     for record in results:
-        if isinstance(record, dict):
-            columns.update(record.keys())
-    
-    # filter out status columns and sort
-    columns = sorted([col for col in columns if col != 'status'])
+        if not isinstance(record, dict):
+            continue
+        if len(rows) == max_rows:
+            more = True
+            break
+        rows.append(record)
+    return rows, more
+
+
+def table_layout(rows: list, max_width: int):
+    """columns, header names, cell text and widths computed from the displayed rows only"""
+    columns = []
+    seen = set()
+    for record in rows:
+        for col in record:
+            if col not in seen and col != 'status':
+                seen.add(col)
+                columns.append(col)
+    columns.sort()
+    
+    headers = [truncate_cell(display_column_name(col), max_width) for col in columns]
+    cells = [[truncate_cell(record.get(col, ''), max_width) for col in columns] for record in rows]
+    
+    widths = [len(header) for header in headers]
+    for row in cells:
+        for i, text in enumerate(row):
+            if len(text) > widths[i]:
+                widths[i] = len(text)
+    
+    return columns, headers, cells, [width + 2 for width in widths]  # padding
+
+
+def render_row(values: list, col_widths: list) -> str:
+    return "│" + "".join(f" {value:<{col_widths[i]-1}}│" for i, value in enumerate(values))
+
+
+def render_border(col_widths: list, left: str, middle: str, right: str) -> str:
+    return left + middle.join("─" * width for width in col_widths) + right
+
+
+def format_table(results, total_count: int = None, truncated: bool = False,
+                 max_rows: int = QUERY_PREVIEW_ROWS, max_col_width: int = TABLE_MAX_COLUMN_WIDTH) -> str:
+    """format results as a clean table with headers
+
+    results can be any iterable - only the first max_rows records are read, so
+    formatting a huge result costs the same as formatting max_rows.
+    total_count is the full result size if the caller knows it, truncated means
+    the caller stopped fetching before the end of the result
+    """
+    rows, more = take_display_rows(results, max_rows)
+    if not rows:
+        return "no results found"
     
+    columns, headers, cells, col_widths = table_layout(rows, max_col_width)
     if not columns:
         return "no data to display"
     
-    # clean up column names for display
-    display_columns = []
-    for col in columns:
-        # convert p.name to Name, c.name to Country, etc
-        if '.' in col:
-            prefix, suffix = col.split('.', 1)
-            if suffix == 'name':
-                if prefix == 'p':
-                    display_columns.append('Name')
-                elif prefix == 'c':
-                    display_columns.append('Country')
-                elif prefix == 'pr':
-                    display_columns.append('Product')
-                else:
-                    display_columns.append(suffix.title())
-            else:
-                display_columns.append(suffix.title())
-        else:
-            display_columns.append(col.title())
-    
-    # calculate column widths
-    col_widths = []
-    for i, col in enumerate(display_columns):
-        max_width = len(col)
-        for record in results:
-            if isinstance(record, dict):
-                value = str(record.get(columns[i], ''))
-                max_width = max(max_width, len(value))
-        col_widths.append(max_width + 2)  # padding
-    
     # build table
-    table_lines = []
-    
-    # header separator
-    table_lines.append("┌" + "┬".join("─" * width for width in col_widths) + "┐")
-    
-    # header row
-    header_row = "│"
-    for i, col in enumerate(display_columns):
-        header_row += f" {col:<{col_widths[i]-1}}│"
-    table_lines.append(header_row)
-    
-    # separator between header and data
-    table_lines.append("├" + "┼".join("─" * width for width in col_widths) + "┤")
-    
-    # data rows
-    for record in results[:10]:  # limit to 10 results
-        if isinstance(record, dict):
-            row = "│"
-            for i, col in enumerate(columns):
-                value = str(record.get(col, ''))
-                row += f" {value:<{col_widths[i]-1}}│"
-            table_lines.append(row)
-    
-    # bottom border
-    table_lines.append("└" + "┴".join("─" * width for width in col_widths) + "┘")
+    table_lines = [
+        render_border(col_widths, "┌", "┬", "┐"),
+        render_row(headers, col_widths),
+        render_border(col_widths, "├", "┼", "┤")
+    ]
+    table_lines.extend(render_row(row, col_widths) for row in cells)
+    table_lines.append(render_border(col_widths, "└", "┴", "┘"))
     
     # add truncation note if needed
-    if len(results) > 10:
-        table_lines.append(f"\n({len(results)} total results, showing first 10)")
+    if total_count is not None and total_count > len(rows):
+        table_lines.append(f"\n({total_count} total results, showing first {len(rows)})")
+    elif more or truncated:
+        table_lines.append(f"\n(more results available, showing first {len(rows)})")
     
     return "\n".join(table_lines)
 
+
+def iter_table_lines(results, page_size: int = QUERY_PREVIEW_ROWS,
+                     max_col_width: int = TABLE_MAX_COLUMN_WIDTH):
+    """streaming mode - yields table lines as records arrive
+
+    the layout is fixed from the first page_size records, later values are cut to fit it
+    """
+    records = (record for record in results if isinstance(record, dict))
+    first_page = list(islice(records, page_size))
+    if not first_page:
+        yield "no results found"
+        return
+    
+    columns, headers, cells, col_widths = table_layout(first_page, max_col_width)
+    if not columns:
+        yield "no data to display"
+        return
+    
+    # later rows may be wider than the first page, leave them some room
+    min_width = min(max_col_width, STREAM_MIN_COLUMN_WIDTH) + 2
+    col_widths = [max(width, min_width) for width in col_widths]
+    
+    yield render_border(col_widths, "┌", "┬", "┐")
+    yield render_row(headers, col_widths)
+    yield render_border(col_widths, "├", "┼", "┤")
+    for row in cells:
+        yield render_row(row, col_widths)
+    
+    count = len(cells)
+    for record in records:
+        count += 1
+        yield render_row(
+            [truncate_cell(record.get(col, ''), col_widths[i] - 2) for i, col in enumerate(columns)],
+            col_widths
+        )
+    
+    yield render_border(col_widths, "└", "┴", "┘")
+    yield f"\n({count} results)"
+
+
 def format_cypher_query(query: str) -> str:
     """format cypher query in a nice code block"""
     # calculate width based on query length + padding
@@ -93,7 +162,7 @@ def format_cypher_query(query: str) -> str:
     
     return "\n".join(lines)
 
-def format_response(question: str, cypher_query: str, results: list) -> str:
+def format_response(question: str, cypher_query: str, results: list, truncated: bool = False) -> str:
     output = []
     
     output.append(f"question: {question}")
@@ -138,6 +207,6 @@ def format_response(question: str, cypher_query: str, results: list) -> str:
         output.append("- usa (country)")
     else:
         output.append("results:")
-        output.append(format_table(results))
+        output.append(format_table(results, truncated=truncated))
     
     return "\n".join(output) 
\ No newline at end of file
@@ -0,0 +1,60 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """refills continuously at rate_per_minute up to a full minute of capacity"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.available = float(rate_per_minute)
+        self.refill_per_second = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """seconds until amount can be taken (0 if available now)"""
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.refill_per_second
+
+
+class RateLimiter:
+    """blocks callers so that requests/min and tokens/min limits are respected
+
+    a limit of 0 disables that bucket
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: int = 0) -> None:
+        """waits until one request costing roughly `tokens` tokens is allowed"""
+        buckets = [(self.requests, 1.0), (self.tokens, float(tokens))]
+        buckets = [(bucket, min(amount, bucket.capacity)) for bucket, amount in buckets if bucket]
+        if not buckets:
+            return
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                for bucket, _ in buckets:
+                    bucket.refill(now)
+
+                wait = max(bucket.wait_time(amount) for bucket, amount in buckets)
+                if wait <= 0:
+                    for bucket, amount in buckets:
+                        bucket.available -= amount
+                    return
+
+            time.sleep(wait)
+
+
+def estimate_tokens(text: str) -> int:
+    """rough token count used for budgeting (about 4 characters per token)"""
+    return len(text) // 4